@@ -1,20 +1,34 @@
 from __future__ import annotations
 
 import os
+import csv
+import html
 import json
+import threading
+import time
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, List
+from typing import Any, Iterable, List
 
 from aqt import mw  # type: ignore
 from aqt.qt import *  # type: ignore
 
+from .aggregate import (
+    EXPORT_FIELDS,
+    compute_due_forecast,
+    compute_last_n_days_counts,
+    iter_daily_aggregates,
+    last_query_info,
+)
+
 try:
     from aqt import gui_hooks  # type: ignore
 except Exception:
     gui_hooks = None  # type: ignore
 
 _DIRTY = False  # review中に進んだ印
+_FORECAST_DIRTY = False  # 予定が変わったかもしれない印（回答・同期・スケジュール変更）
 
 def _addon_id() -> str:
     # できるだけ確実に「今ロードされてるこのアドオンのID(フォルダ名)」を得る
@@ -55,6 +69,24 @@ def _defaults() -> dict[str, Any]:
         # Range
         "range_days": 30,            # 7 / 30 / 90 / 180 / 365 推奨
 
+        # Forecast（今日より右に、これからの復習予定を並べる）
+        "forecast_days": 0,           # 0 / 7 / 30（0 = 表示しない）
+        "forecast_bar_rgba": "rgba(120,160,235,0.25)",
+        "forecast_over_goal_rgba": "rgba(235,150,90,0.45)",
+
+        # Overview（デッキ画面）
+        "show_on_overview": True,     # 選んだデッキ（子デッキ込み）だけのグラフを出す
+
+        # Reviewer
+        "reviewer_mini_chart": True,  # 復習中、下のバーに「今日/目標」と7日の折れ線を出す
+
+        # Diagnostics
+        "perf_instrumentation": False,  # 描画・レイアウト・リサイズの時間を JS から集める
+
+        # Query
+        "enable_pan_zoom": True,      # チャートを横スクロール/ドラッグで過去へ、Ctrl+ホイールでズーム
+        "query_strategy": "auto",     # auto / grouped / probe / rollup（結果は同じ、速さだけ違う）
+
         # Layout
         "chart_height_px": 140,
         "chart_width_vw": 75,         # 例: 75 => 75vw
@@ -87,6 +119,12 @@ def _defaults() -> dict[str, Any]:
         # 今日 + ゴール達成（赤を少し濃く：被らない）
         "today_goal_bar_rgba": "rgba(220,90,90,0.90)",
         "today_goal_outline_rgba": "rgba(180,70,70,0.65)",
+
+        # Stats strip / 移動平均線
+        "show_stats": True,           # ストリーク・平均・達成率の行を表示
+        "show_moving_avg": True,      # 7日/30日移動平均の線を重ねる
+        "ma7_rgba": "rgba(235,170,90,0.85)",
+        "ma30_rgba": "rgba(140,110,200,0.75)",
     }
 
 
@@ -130,6 +168,15 @@ def _write_conf(c: dict[str, Any]) -> None:
         pass
 
 
+def _write_conf_keys(values: dict[str, Any], drop: Iterable[str] = ()) -> None:
+    # キャッシュ用：書く直前に読み直して、自分のキーだけ差し替える（設定の保存を上書きしない）
+    c = _get_conf()
+    c.update(values)
+    for k in drop:
+        c.pop(k, None)
+    _write_conf(c)
+
+
 def _get_config_merged() -> dict[str, Any]:
     d = _defaults()
     c = _get_conf()
@@ -144,97 +191,721 @@ def _cfg(key: str, default: Any) -> Any:
 
 # -------------------- data aggregation (cached) --------------------
 
+# 30日移動平均の窓を表示範囲の1本目から満たすため、範囲より前に余分に数える日数
+_MA_LEAD = 29
+
+
 def _today_key() -> str:
     return datetime.now().date().isoformat()
 
 
-def _compute_last_n_days_counts(days: int) -> List[int]:
-    """直近N日（今日含む）のrevlog行数を日別に集計（DBでgroup byして軽量化）。"""
+def _ext_start(ext: int) -> str:
+    # 今日で終わる ext 日の1日目
+    return (datetime.now().date() - timedelta(days=ext - 1)).isoformat()
+
+
+def _compute_last_n_days_counts(
+    days: int,
+    est_rows: int | None = None,
+    known: dict[int, int] | None = None,
+    select_days: int | None = None,
+) -> List[int]:
+    """直近N日（今日含む）のrevlog行数を日別に集計（本体は aggregate.py と共通）。"""
     if not mw.col:
         return [0] * max(1, days)
+    strategy = str(_cfg("query_strategy", "auto") or "auto")
+    return compute_last_n_days_counts(
+        mw.col.db, days, strategy=strategy, est_rows=est_rows, known=known, select_days=select_days,
+    )
+
+
+def _get_cached_counts(force: bool = False, full: bool = False) -> List[int]:
+    """
+    直近 range_days 日の件数（config.json にキャッシュ）。
+
+    force: 今日のキャッシュがあっても引き直す。
+    full: 締まった日も信用せず全部引き直す（同期で過去の日が増えた時など）。
+    """
+    if not bool(_cfg("enabled", True)):
+        return [0] * int(_cfg("range_days", 30) or 30)
 
-    days = int(days)
+    days = int(_cfg("range_days", 30) or 30)
     if days < 1:
         days = 1
 
-    today = datetime.now().date()
-    start_day = today - timedelta(days=days - 1)
+    c = _get_conf()
+    cache_key = str(c.get("cache_key", ""))
+    cache_counts = c.get("cache_counts")
 
-    start_dt = datetime.combine(start_day, datetime.min.time())
-    end_dt = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    key_now = f"{_today_key()}:{days}"
 
-    start_ms = int(start_dt.timestamp() * 1000)
-    end_ms = int(end_dt.timestamp() * 1000) - 1
+    if (
+        (not force)
+        and cache_key == key_now
+        and isinstance(cache_counts, list)
+        and len(cache_counts) == days
+        and isinstance(c.get("cache_lead"), list)
+    ):
+        try:
+            return [int(x) for x in cache_counts]
+        except Exception:
+            pass
 
-    # day_key: Unix ms -> 日単位に丸めたキー（UTC基準のズレは「日別傾向」用途なら許容）
-    # もし「ローカル日付」厳密が必要なら、オフセット補正を入れる（通常は不要）。
-    rows = mw.col.db.all(
-        """
-        SELECT (id / 86400000) AS day_key, COUNT(*) AS cnt
-        FROM revlog
-        WHERE id BETWEEN ? AND ?
-        GROUP BY day_key
-        """,
-        start_ms, end_ms,
+    # 表示範囲の前に _MA_LEAD 日ぶん余分に数える（移動平均の窓を最初のバーから埋める）
+    old_lead = c.get("cache_lead")
+    old_ext: List[int] = []
+    try:
+        if isinstance(cache_counts, list) and len(cache_counts) == days \
+                and isinstance(old_lead, list) and len(old_lead) == _MA_LEAD:
+            old_ext = [int(x) for x in old_lead + cache_counts]
+    except Exception:
+        old_ext = []
+
+    # 同じ窓の再集計（レビュー後）なら、締まった日は前回の値をそのまま使える
+    ext = days + _MA_LEAD
+    est_rows = sum(old_ext) if old_ext else None
+    known = None
+    if old_ext and cache_key == key_now and not full:
+        known = {i: old_ext[i] for i in range(ext - 1)}
+
+    # auto の戦略は表示範囲（days）で選ぶ。lead の分で probe が選べなくならないように
+    ext_counts = _compute_last_n_days_counts(ext, est_rows, known, select_days=days)
+    lead, counts = ext_counts[:_MA_LEAD], ext_counts[_MA_LEAD:]
+    if _perf_enabled():
+        q = last_query_info()
+        _perf_add("py_query:" + str(q.get("strategy", "")), ext, q.get("ms", 0.0))
+    goal = int(_cfg("goal_per_day", 200) or 0)
+
+    # 統計も一緒に更新：同じ窓で「今日」だけ変わったなら O(1)、それ以外は作り直し
+    st = c.get("cache_stats")
+    if (
+        cache_key == key_now
+        and old_ext[:-1] == ext_counts[:-1]
+        and _stats_fit(st, days, goal)
+        and int(st["lead"]) == _MA_LEAD
+    ):
+        _replace_last_stats_day(st, counts[-1], goal)
+    else:
+        # 日が変わった時は、前回の統計から範囲より前の連続を引き継ぐ
+        start = _ext_start(ext)
+        st = _build_stats(counts, goal, lead, start, _carried_run(st, start, goal))
+
+    _write_conf_keys(
+        {
+            "cache_key": key_now,
+            "cache_counts": counts,
+            "cache_lead": lead,
+            "cache_stats": st,
+            "cache_query": last_query_info(),
+        },
+        drop=("cache_prefix", "cache_runs", "cache_stats_goal"),  # 旧形式
     )
+    return counts
 
-    counts = [0] * days
-    start_key = start_ms // 86400000
 
-    for day_key, cnt in rows:
+# -------------------- per-deck counts (Overview, LRU) --------------------
+
+_DECK_CACHE_MAX = 32
+
+# (deck id, today, days) -> {"counts", "lead", "stats", "query"}。古いものから捨てる
+_DECK_CACHE: "OrderedDict[tuple[int, str, int], dict[str, Any]]" = OrderedDict()
+# 復習後：今日の値だけ怪しいデッキ（次に開いた時に今日だけ数え直す）
+_DECK_STALE: set[tuple[int, str, int]] = set()
+
+
+def _deck_subtree_ids(did: int) -> List[int]:
+    decks = mw.col.decks
+    try:
+        return [int(x) for x in decks.deck_and_child_ids(did)]
+    except Exception:
+        pass
+    # 古い Anki：children() が直下だけの版もあるので、たどって孫以下も集める
+    out: List[int] = []
+    stack = [int(did)]
+    while stack:
+        d = stack.pop()
+        if d in out:
+            continue
+        out.append(d)
         try:
-            idx = int(day_key) - int(start_key)
+            stack.extend(int(c[1]) for c in decks.children(d))
         except Exception:
-            continue
-        if 0 <= idx < days:
-            try:
-                counts[idx] = int(cnt)
-            except Exception:
-                counts[idx] = 0
+            pass
+    return out
 
-    return counts
 
+def _get_deck_counts(did: int) -> dict[str, Any]:
+    """
+    デッキ（子デッキ込み）の直近 range_days 日と、その統計。2回目からはキャッシュだけ。
 
-def _get_cached_counts(force: bool = False) -> List[int]:
-    if not bool(_cfg("enabled", True)):
-        return [0] * int(_cfg("range_days", 30) or 30)
+    全体と同じく _MA_LEAD 日前から数え、統計（_build_stats）もデッキの件数で作る。
+    """
+    days = max(1, int(_cfg("range_days", 30) or 30))
+    goal = int(_cfg("goal_per_day", 200) or 0)
+    if not mw.col:
+        return {"counts": [0] * days, "stats": None, "query": {}}
+
+    key = (int(did), _today_key(), days)
+    ent = _DECK_CACHE.get(key)
+    if ent is not None and key not in _DECK_STALE and _stats_fit(ent["stats"], days, goal):
+        _DECK_CACHE.move_to_end(key)
+        return ent
+
+    # 古い値があれば締まった日はそのまま使う（rollup で今日だけ数える）
+    known = None
+    est_rows = None
+    old_ext: List[int] = []
+    if ent is not None:
+        old_ext = ent["lead"] + ent["counts"]
+        known = {i: v for i, v in enumerate(old_ext[:-1])}
+        est_rows = sum(old_ext)
+
+    strategy = str(_cfg("query_strategy", "auto") or "auto")
+    ext_counts = compute_last_n_days_counts(
+        mw.col.db, days + _MA_LEAD, strategy=strategy, est_rows=est_rows, known=known,
+        dids=_deck_subtree_ids(did), select_days=days,
+    )
+    lead, counts = ext_counts[:_MA_LEAD], ext_counts[_MA_LEAD:]
 
-    days = int(_cfg("range_days", 30) or 30)
-    if days < 1:
-        days = 1
+    st = ent["stats"] if ent is not None else None
+    if old_ext[:-1] == ext_counts[:-1] and _stats_fit(st, days, goal):
+        _replace_last_stats_day(st, counts[-1], goal)
+    else:
+        # 連続は同じ日の古い値か、昨日のエントリ（まだ LRU に残っていれば）から引き継ぐ
+        start = _ext_start(days + _MA_LEAD)
+        if st is None:
+            yesterday = (datetime.now().date() - timedelta(days=1)).isoformat()
+            prev = _DECK_CACHE.get((int(did), yesterday, days))
+            st = prev["stats"] if prev is not None else None
+        st = _build_stats(counts, goal, lead, start, _carried_run(st, start, goal))
 
-    c = _get_conf()
-    cache_key = str(c.get("cache_key", ""))
-    cache_counts = c.get("cache_counts")
+    ent = {"counts": counts, "lead": lead, "stats": st, "query": last_query_info()}
+    _DECK_CACHE[key] = ent
+    _DECK_CACHE.move_to_end(key)
+    _DECK_STALE.discard(key)
+    while len(_DECK_CACHE) > _DECK_CACHE_MAX:
+        old, _v = _DECK_CACHE.popitem(last=False)
+        _DECK_STALE.discard(old)
+    return ent
+
+
+def _peek_deck_counts(did: int) -> dict[str, Any] | None:
+    # DBに触らず、キャッシュにあればそれを返す（今日の値が古くてもよい時用）
+    days = max(1, int(_cfg("range_days", 30) or 30))
+    return _DECK_CACHE.get((int(did), _today_key(), days))
 
-    key_now = f"{_today_key()}:{days}"
 
-    if (not force) and cache_key == key_now and isinstance(cache_counts, list) and len(cache_counts) == days:
+def _mark_deck_cache_stale() -> None:
+    _DECK_STALE.update(_DECK_CACHE.keys())
+
+
+def _clear_deck_cache() -> None:
+    _DECK_CACHE.clear()
+    _DECK_STALE.clear()
+
+
+# -------------------- due forecast (cached separately) --------------------
+
+def _get_cached_forecast(force: bool = False) -> List[int]:
+    """明日以降 forecast_days 日分の予定。回答・同期・スケジュール変更で汚れた時だけ引き直す。"""
+    global _FORECAST_DIRTY
+
+    n = int(_cfg("forecast_days", 0) or 0)
+    if n <= 0 or not mw.col:
+        return []
+
+    try:
+        sched_today = int(mw.col.sched.today)
+    except Exception:
+        return []
+
+    c = _get_conf()
+    key_now = f"{sched_today}:{n}"
+    cached = c.get("forecast_counts")
+
+    if (
+        (not force)
+        and (not _FORECAST_DIRTY)
+        and str(c.get("forecast_key", "")) == key_now
+        and isinstance(cached, list)
+        and len(cached) == n
+    ):
         try:
-            return [int(x) for x in cache_counts]
+            return [int(x) for x in cached]
         except Exception:
             pass
 
-    counts = _compute_last_n_days_counts(days)
-    c["cache_key"] = key_now
-    c["cache_counts"] = counts
-    _write_conf(c)
+    counts = compute_due_forecast(mw.col.db, sched_today, n)
+    _FORECAST_DIRTY = False
+    _write_conf_keys({"forecast_key": key_now, "forecast_counts": counts})
     return counts
 
 
+def _invalidate_forecast(*args, **kwargs) -> None:
+    global _FORECAST_DIRTY
+    _FORECAST_DIRTY = True
+
+
+def _on_operation_did_execute(changes, handler) -> None:
+    # カードやキューが変わる操作（期日変更・リセット・デッキ設定など）だけ
+    if getattr(changes, "card", False) or getattr(changes, "study_queues", False):
+        _invalidate_forecast()
+    # カードの移動・削除などでデッキ別の件数が変わる。回答は今日だけ数え直す（_DECK_STALE）
+    answered = handler is not None and handler is getattr(mw, "reviewer", None)
+    if getattr(changes, "card", False) and not answered:
+        _clear_deck_cache()
+
+
+# -------------------- stats (prefix sums / run lengths) --------------------
+
+def _goal_met(v: int, goal: int) -> bool:
+    return goal > 0 and v >= goal
+
+
+def _build_stats(
+    counts: List[int],
+    goal: int,
+    lead: List[int] | None = None,
+    start: str = "",
+    carry: int = 0,
+) -> dict[str, Any]:
+    """
+    統計用の配列をまとめて作る（O(N)、窓が変わった時だけ）。
+
+    prefix: lead + counts の累積和（長さ len(lead)+N+1）。lead は表示範囲より前の日で、
+            移動平均の窓を最初のバーから埋めるのに使う
+    runs:   lead + counts の各日までの連続達成日数。lead の1日目の前日までの連続（carry）から数えるので、
+            ストリークは表示範囲で切れない
+    start:  lead の1日目（ISO日付）。翌日以降の作り直しで carry を引き継ぐのに使う
+    best / hits: 表示範囲の締まった日（今日を除く）の最長連続・達成日数。今日の差し替えでは変わらない
+    """
+    lead = [int(v) for v in (lead or [])]
+    prefix = [0]
+    runs: List[int] = []
+    prev = max(0, int(carry))
+    for v in lead:
+        prefix.append(prefix[-1] + v)
+        prev = prev + 1 if _goal_met(v, goal) else 0
+        runs.append(prev)
+    st: dict[str, Any] = {
+        "goal": goal, "lead": len(lead), "start": start, "carry": max(0, int(carry)),
+        "prefix": prefix, "runs": runs, "best": 0, "hits": 0,
+    }
+    for v in counts:
+        _append_stats_day(st, v, goal)
+    return st
+
+
+def _carried_run(old: Any, start: str, goal: int) -> int:
+    """前回の統計から、start の前日までの連続達成日数を引き継ぐ（無い・目標が違う時は0）。"""
+    try:
+        if not isinstance(old, dict) or int(old.get("goal", -1)) != goal or not start:
+            return 0
+        off = (datetime.fromisoformat(start) - datetime.fromisoformat(str(old["start"]))).days
+        if off == 0:
+            return int(old.get("carry", 0))
+        if 1 <= off <= len(old["runs"]):
+            return int(old["runs"][off - 1])
+    except Exception:
+        pass
+    return 0
+
+
+def _stats_lead(st: dict[str, Any]) -> List[int]:
+    prefix = st["prefix"]
+    return [prefix[i + 1] - prefix[i] for i in range(int(st["lead"]))]
+
+
+def _push_stats_day(st: dict[str, Any], v: int, goal: int) -> None:
+    prefix, runs = st["prefix"], st["runs"]
+    prefix.append(prefix[-1] + int(v))
+    prev = runs[-1] if runs else int(st.get("carry", 0))
+    runs.append(prev + 1 if _goal_met(int(v), goal) else 0)
+
+
+def _append_stats_day(st: dict[str, Any], v: int, goal: int) -> None:
+    # 1日ぶん末尾に足す（O(1)）：それまでの「今日」が表示範囲の日なら、締まった日として best/hits に入る
+    runs = st["runs"]
+    if len(runs) > int(st["lead"]):
+        st["best"] = max(st["best"], runs[-1])
+        st["hits"] += 1 if runs[-1] > 0 else 0
+    _push_stats_day(st, v, goal)
+
+
+def _replace_last_stats_day(st: dict[str, Any], v: int, goal: int) -> None:
+    # 今日の値だけ差し替える（O(1)）：レビュー後の再集計はほぼこれで済む
+    st["prefix"].pop()
+    st["runs"].pop()
+    _push_stats_day(st, v, goal)
+
+
+def _stats_fit(st: Any, days: int, goal: int) -> bool:
+    # 長さと目標だけ見る（O(1)）。中身の整合は保存する側が cache_key と一緒に保証する
+    try:
+        lead = int(st["lead"])
+        return (
+            isinstance(st, dict)
+            and int(st.get("goal", -1)) == goal
+            and len(st["runs"]) == lead + days
+            and len(st["prefix"]) == lead + days + 1
+        )
+    except Exception:
+        return False
+
+
+def _rebuild_stats(st: Any, counts: List[int], goal: int) -> dict[str, Any]:
+    # 目標が変わった時など：lead は手元の統計から取り出して使う（移動平均の線を欠けさせない）
+    lead: List[int] = []
+    start = ""
+    try:
+        if len(st["prefix"]) == int(st["lead"]) + len(counts) + 1:
+            lead, start = _stats_lead(st), str(st.get("start", ""))
+    except Exception:
+        pass
+    return _build_stats(counts, goal, lead, start)
+
+
+def _get_cached_stats(counts: List[int], goal: int) -> dict[str, Any]:
+    """_get_cached_counts が counts と一緒に保存した統計を使う。無い・ずれている時だけ作り直す。"""
+    c = _get_conf()
+    st = c.get("cache_stats")
+    if str(c.get("cache_key", "")) != f"{_today_key()}:{len(counts)}":
+        return _build_stats(counts, goal)
+    if _stats_fit(st, len(counts), goal) and st["prefix"][-1] - st["prefix"][-2] == counts[-1]:
+        return st
+    lead = c.get("cache_lead")
+    if isinstance(lead, list) and len(lead) == _MA_LEAD:
+        start = (datetime.now().date() - timedelta(days=len(counts) + _MA_LEAD - 1)).isoformat()
+        return _build_stats(counts, goal, lead, start)
+    return _build_stats(counts, goal)
+
+
+def _moving_average(st: dict[str, Any], window: int) -> List[float | None]:
+    """
+    prefix から各日の移動平均を O(1)/日で出す。
+
+    窓が揃わない日（lead が足りない先頭）は None：短い窓の平均で線が跳ねないよう、線はそこから始める。
+    """
+    prefix = st["prefix"]
+    lead = int(st["lead"])
+    w = max(1, int(window))
+    out: List[float | None] = []
+    for i in range(len(st["runs"]) - lead):
+        hi = lead + i + 1
+        lo = hi - w
+        out.append(None if lo < 0 else (prefix[hi] - prefix[lo]) / float(w))
+    return out
+
+
+def _summarize_stats(st: dict[str, Any], goal: int) -> dict[str, Any]:
+    prefix, runs = st["prefix"], st["runs"]
+    n = len(runs) - int(st["lead"])  # 表示範囲の日数
+    if n <= 0:
+        return {"current_streak": 0, "longest_streak": 0, "avg7": 0.0, "avg30": 0.0, "hit_rate": 0.0}
+
+    # 今日まだ未達でも、昨日までの連続は「継続中」として数える
+    current = runs[-1]
+    if current == 0:
+        current = runs[-2] if len(runs) > 1 else int(st.get("carry", 0))
+
+    # 達成率：今日はまだ締まっていないので、達成済みの時だけ数に入れる（未達を外れ扱いしない）
+    today_hit = 1 if runs[-1] > 0 else 0
+    judged = (n - 1) + today_hit
+    hits = int(st["hits"]) + today_hit
+    avail = len(prefix) - 1  # lead 込みで遡れる日数
+
+    def window_avg(w: int) -> float:
+        w = min(w, avail)
+        return (prefix[-1] - prefix[-1 - w]) / float(w)
+
+    return {
+        "current_streak": current,
+        "longest_streak": max(int(st["best"]), runs[-1]),
+        "avg7": window_avg(7),
+        "avg30": window_avg(30),
+        "hit_rate": (hits * 100.0 / judged) if goal > 0 and judged > 0 else 0.0,
+    }
+
+
+# -------------------- history chunks (pan / zoom over pycmd) --------------------
+
+_CHUNK_SIZES = (7, 30, 90, 180, 365)
+_CHUNK_CACHE_MAX = 48
+
+# (today, offset, size) -> counts。今日を含まない（締まった）チャンクだけ入れる
+_CHUNK_CACHE: "OrderedDict[tuple[str, int, int], List[int]]" = OrderedDict()
+_FIRST_REVIEW: dict[str, Any] = {}
+
+
+def _first_review_ms() -> int | None:
+    # 一番古い revlog（主キーの先頭なので一瞬）。1日1回だけ引く。revlog が空なら None
+    today = _today_key()
+    if _FIRST_REVIEW.get("day") != today:
+        ms = mw.col.db.scalar("SELECT MIN(id) FROM revlog") if mw.col else None
+        _FIRST_REVIEW.clear()
+        _FIRST_REVIEW.update({"day": today, "ms": int(ms) if ms is not None else None})
+    return _FIRST_REVIEW.get("ms")
+
+
+def _has_history_before(start_ms: int) -> bool:
+    first = _first_review_ms()
+    return first is not None and first < start_ms
+
+
+def _clear_history_cache() -> None:
+    # 同期で過去の日が増えた・一番古い復習が変わった時
+    _CHUNK_CACHE.clear()
+    _FIRST_REVIEW.clear()
+
+
+def _history_chunk(offset: int, size: int) -> dict[str, Any]:
+    """今日から offset 日さかのぼった日で終わる size 日分を、小さな dict で返す。"""
+    offset = max(0, int(offset))
+    size = max(1, min(max(_CHUNK_SIZES), int(size)))
+
+    today = datetime.now().date()
+    end_day = today - timedelta(days=offset)
+    start_day = end_day - timedelta(days=size - 1)
+    days = max(1, int(_cfg("range_days", 30) or 30))
+
+    if offset == 0 and size == days:
+        counts = _get_cached_counts()
+    elif not mw.col:
+        counts = [0] * size
+    else:
+        key = (today.isoformat(), offset, size)
+        counts = _CHUNK_CACHE.get(key) if offset > 0 else None
+        if counts is not None:
+            _CHUNK_CACHE.move_to_end(key)
+        else:
+            strategy = str(_cfg("query_strategy", "auto") or "auto")
+            counts = compute_last_n_days_counts(mw.col.db, size, end_day, strategy)
+            if offset > 0:
+                _CHUNK_CACHE[key] = counts
+                while len(_CHUNK_CACHE) > _CHUNK_CACHE_MAX:
+                    _CHUNK_CACHE.popitem(last=False)
+
+    start_ms = int(datetime.combine(start_day, datetime.min.time()).timestamp() * 1000)
+    return {
+        "o": offset,
+        "n": size,
+        "s": start_day.isoformat(),
+        "c": counts,
+        "more": _has_history_before(start_ms),
+    }
+
+
+def _on_js_message(handled, message, context):
+    # pycmd("lm30:chunk:<offset>:<size>") -> JSON
+    if not isinstance(message, str) or not message.startswith("lm30:"):
+        return handled
+    try:
+        if message.startswith("lm30:perf:"):
+            # チャートを出している画面からだけ受け取る
+            if context.__class__.__name__ not in _PERF_JS_CONTEXTS:
+                return handled
+            _perf_from_js(message[len("lm30:perf:"):])
+            return (True, None)
+        parts = message.split(":")
+        if parts[1] == "chunk":
+            # 再計算中で待ちきれなければ null（JS 側はそのチャンクを読まずに止まる）
+            chunk = _REFRESH.call(lambda: _history_chunk(int(parts[2]), int(parts[3])), lambda: None)
+            if chunk is None:
+                return (True, None)
+            return (True, json.dumps(chunk, separators=(",", ":")))
+    except Exception:
+        pass
+    return (True, None)
+
+
+# -------------------- timings (Python render path + front end) --------------------
+
+# (metric, bars) -> {"n", "total", "max", "last"}（ms）
+_PERF: dict[tuple[str, int], dict[str, float]] = {}
+_PERF_LOCK = threading.Lock()
+
+# JS から受け取る計測名（チャートのスクリプトが送るものだけ。知らない名前でキーを増やさない）
+_PERF_JS_METRICS = ("script_start", "layout", "first-paint", "first-contentful-paint", "first_frame", "resize")
+_PERF_JS_CONTEXTS = ("DeckBrowser", "Overview")
+
+
+def _perf_enabled() -> bool:
+    return bool(_cfg("perf_instrumentation", False))
+
+
+def _perf_add(metric: str, bars: int, ms: float, n: int = 1, max_ms: float | None = None) -> None:
+    """n 回分の合計 ms を足す（JS 側でまとめて送ってくる resize 用に n と max を取れる）。"""
+    key = (str(metric), int(bars))
+    with _PERF_LOCK:
+        st = _PERF.setdefault(key, {"n": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+        st["n"] += max(1, int(n))
+        st["total"] += float(ms)
+        st["max"] = max(st["max"], float(max_ms if max_ms is not None else ms))
+        st["last"] = float(ms) / max(1, int(n))
+
+
+def _perf_from_js(payload: str) -> None:
+    d = json.loads(payload)
+    k = str(d.get("k"))
+    bars = int(d.get("bars", 0))
+    if k not in _PERF_JS_METRICS or not 0 <= bars <= 1000:
+        return
+    _perf_add("js_" + k, bars, float(d.get("ms", 0.0)), int(d.get("n", 1)), d.get("max"))
+
+
+def perf_summary() -> str:
+    """集めた時間の一覧（bar 数ごと）。"""
+    with _PERF_LOCK:
+        items = sorted(_PERF.items(), key=lambda kv: (kv[0][1], kv[0][0]))
+    if not items:
+        return "No timings yet. Enable timing collection and open the Decks screen."
+    lines = [f"{'metric':<22}{'bars':>6}{'n':>7}{'mean ms':>10}{'max ms':>10}{'last ms':>10}"]
+    for (metric, bars), st in items:
+        mean = st["total"] / st["n"] if st["n"] else 0.0
+        lines.append(f"{metric:<22}{bars:>6}{int(st['n']):>7}{mean:>10.2f}{st['max']:>10.2f}{st['last']:>10.2f}")
+    return "\n".join(lines)
+
+
+# -------------------- export (full history, streaming) --------------------
+
+def _write_aggregates(rows: Iterable[dict[str, Any]], path: str, fmt: str) -> int:
+    # 1行ずつ書き出す（リストに溜めない）
+    n = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "json":
+            f.write("[")
+            for r in rows:
+                f.write(("," if n else "") + "\n  " + json.dumps(r, ensure_ascii=False))
+                n += 1
+            f.write("\n]\n" if n else "]\n")
+        else:
+            w = csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
+            w.writeheader()
+            for r in rows:
+                w.writerow(r)
+                n += 1
+    return n
+
+
+def _export_format(path: str, fmt: str | None) -> str:
+    if fmt:
+        fmt = fmt.lower()
+    elif path.lower().endswith(".json"):
+        fmt = "json"
+    else:
+        fmt = "csv"
+    if fmt not in ("csv", "json"):
+        raise ValueError(f"unsupported export format: {fmt}")
+    return fmt
+
+
+def export_daily_aggregates(path: str, fmt: str | None = None, db=None, progress=None) -> int:
+    """
+    全履歴の日別集計（回数・時間・種別内訳）を CSV / JSON に書き出す。書いた行数を返す。
+
+    fmt を省略すると拡張子で決める（.json 以外は CSV）。
+    db を省略すると mw.col.db を使う。バックグラウンドから呼んでよい。
+    """
+    fmt = _export_format(path, fmt)
+    if db is None:
+        if not mw.col:
+            return 0
+        db = mw.col.db
+    return _write_aggregates(iter_daily_aggregates(db, progress=progress), path, fmt)
+
+
+class _LockedDB:
+    """
+    db.all を1回ずつ _REFRESH.lock の中で呼ぶ（バックグラウンド用）。
+
+    書き出し全体では lock を握らないので、長い書き出しの間も描画はチャンクの合間に進める。
+    """
+
+    def __init__(self, db) -> None:
+        self._db = db
+
+    def all(self, sql: str, *args: Any) -> List[Any]:
+        with _REFRESH.lock:
+            return self._db.all(sql, *args)
+
+
+def _export_in_background(parent, path: str) -> None:
+    from aqt.operations import QueryOp  # type: ignore
+    from aqt.utils import showWarning, tooltip  # type: ignore
+
+    def report(done: int, total: int) -> None:
+        mw.taskman.run_on_main(
+            lambda: mw.progress.update(
+                label=f"Exporting review history… ({done}/{total} days)",
+                value=done,
+                max=total,
+            )
+        )
+
+    def op(col) -> int:
+        return export_daily_aggregates(path, db=_LockedDB(col.db), progress=report)
+
+    QueryOp(
+        parent=parent,
+        op=op,
+        success=lambda n: tooltip(f"Exported {n} days to {os.path.basename(path)}", parent=parent),
+    ).failure(
+        lambda e: showWarning(f"Export failed: {e}", parent=parent)
+    ).with_progress("Exporting review history…").run_in_background()
+
+
 # -------------------- rendering (ultra-light) --------------------
 
-def _render_bar_chart_html(counts: List[int]) -> str:
-    conf = _get_config_merged()
+# config key -> (CSS変数, 単位)。ここに載っている設定は CSS 変数だけで反映できる
+_CSS_VARS: dict[str, tuple[str, str]] = {
+    "container_border_rgba": ("--lm30-border", ""),
+    "tick_rgba": ("--lm30-tick", ""),
+    "bar_rgba": ("--lm30-bar", ""),
+    "today_bar_rgba": ("--lm30-today", ""),
+    "today_outline_rgba": ("--lm30-today-outline", ""),
+    "goal_line_rgba": ("--lm30-goal-line", ""),
+    "goal_label_opacity": ("--lm30-goal-label-opacity", ""),
+    "goal_met_bar_rgba": ("--lm30-goalmet", ""),
+    "goal_met_outline_rgba": ("--lm30-goalmet-outline", ""),
+    "today_goal_bar_rgba": ("--lm30-today-goal", ""),
+    "today_goal_outline_rgba": ("--lm30-today-goal-outline", ""),
+    "ma7_rgba": ("--lm30-ma7", ""),
+    "ma30_rgba": ("--lm30-ma30", ""),
+    "forecast_bar_rgba": ("--lm30-forecast", ""),
+    "forecast_over_goal_rgba": ("--lm30-forecast-over", ""),
+    "chart_width_vw": ("--lm30-chart-w", "vw"),
+    "chart_min_width_px": ("--lm30-min-w", "px"),
+    "chart_max_width_px": ("--lm30-max-w", "px"),
+}
+
+
+def _css_vars(conf: dict[str, Any]) -> dict[str, str]:
+    dft = _defaults()
+    out: dict[str, str] = {}
+    for key, (var, unit) in _CSS_VARS.items():
+        v = conf.get(key, dft[key])
+        if unit:
+            v = int(v)
+        out[var] = f"{v}{unit}"
+    return out
+
+
+def _render_bar_chart_html(
+    counts: List[int],
+    conf: dict[str, Any] | None = None,
+    forecast: List[int] | None = None,
+    label: str | None = None,
+    stats: dict[str, Any] | None = None,
+) -> str:
+    if conf is None:
+        conf = _get_config_merged()
 
     days = max(1, int(conf.get("range_days", 30) or 30))
     counts = (counts + [0] * days)[:days]
-    maxv = max(counts) if counts else 0
+    forecast = [int(x) for x in (forecast or [])]
+    maxv = max(counts + forecast) if counts else 0
 
     chart_h = int(conf.get("chart_height_px", 140))
-    chart_width_vw = int(conf.get("chart_width_vw", 75))
-    min_w = int(conf.get("chart_min_width_px", 600))
-    max_w = int(conf.get("chart_max_width_px", 1100))
     pad_left = int(conf.get("tick_label_padding_left_px", 34))
 
     goal = int(conf.get("goal_per_day", 200) or 0)
@@ -246,6 +917,39 @@ def _render_bar_chart_html(counts: List[int]) -> str:
 
     total = sum(counts)
     title = f"Last {days} days: {total} reviews"
+    if label:
+        title = f"{html.escape(label)} — {title}"
+
+    # 診断用：最後に使った集計クエリ（タイトルにマウスを乗せると見える）
+    q = conf.get("cache_query")
+    query_tip = ""
+    if isinstance(q, dict) and q.get("strategy"):
+        query_tip = f"query: {q.get('strategy')} ({q.get('ms')} ms)"
+
+    show_stats = bool(conf.get("show_stats", True))
+    show_ma = bool(conf.get("show_moving_avg", True))
+    if stats is None and (show_stats or show_ma):
+        stats = _get_cached_stats(counts, goal)
+    if stats is not None and not _stats_fit(stats, days, goal):
+        stats = _rebuild_stats(stats, counts, goal)
+
+    stats_html = ""
+    if show_stats and stats is not None:
+        st = _summarize_stats(stats, goal)
+        parts = []
+        if goal > 0:
+            parts.append(f"Streak {st['current_streak']} (best in range {st['longest_streak']})")
+        parts.append(f"Avg 7d {st['avg7']:.0f}")
+        if days >= 30:
+            parts.append(f"Avg 30d {st['avg30']:.0f}")
+        if goal > 0:
+            parts.append(f"Goal hit {st['hit_rate']:.0f}%")
+        if forecast:
+            # 予定の平均が目標を超えるなら「このペースは続かない」目安
+            due_avg = sum(forecast) / float(len(forecast))
+            over = " (over goal)" if goal > 0 and due_avg > goal else ""
+            parts.append(f"Due next {len(forecast)}d {due_avg:.0f}/day{over}")
+        stats_html = "<div id='lm30-stats'>" + " · ".join(parts) + "</div>"
 
     today = datetime.now().date()
     start_day = today - timedelta(days=days - 1)
@@ -265,36 +969,67 @@ def _render_bar_chart_html(counts: List[int]) -> str:
             f"<div class='{cls}' data-date='{d}' data-count='{v}' style='height:{h(v)}px;'></div>"
         )
 
+    # 今日より右：これからの予定（目標を超える日は色を変える）
+    forecast_bars = []
+    for i, v in enumerate(forecast):
+        d = (today + timedelta(days=i + 1)).isoformat()
+        cls = "lm-bar lm-forecast"
+        if goal > 0 and v > goal:
+            cls += " lm-over"
+        forecast_bars.append(
+            f"<div class='{cls}' data-date='{d}' data-count='{v}' style='height:{h(v)}px;'></div>"
+        )
+
     # goal line position
     goal_bottom_pct = 0.0
     if show_goal and scale_max > 0:
         goal_bottom_pct = max(0.0, min(100.0, (goal / scale_max) * 100.0))
 
-    # colors
-    dft = _defaults()
-    container_border = str(conf.get("container_border_rgba", dft["container_border_rgba"]))
-    tick_rgba = str(conf.get("tick_rgba", dft["tick_rgba"]))
-    bar_rgba = str(conf.get("bar_rgba", dft["bar_rgba"]))
-    today_bar = str(conf.get("today_bar_rgba", dft["today_bar_rgba"]))
-    today_outline = str(conf.get("today_outline_rgba", dft["today_outline_rgba"]))
-    goal_line = str(conf.get("goal_line_rgba", dft["goal_line_rgba"]))
-    goal_label_opacity = float(conf.get("goal_label_opacity", dft["goal_label_opacity"]))
-    goal_met_bar = str(conf.get("goal_met_bar_rgba", dft["goal_met_bar_rgba"]))
-    goal_met_outline = str(conf.get("goal_met_outline_rgba", dft["goal_met_outline_rgba"]))
-    today_goal_bar = str(conf.get("today_goal_bar_rgba", dft["today_goal_bar_rgba"]))
-    today_goal_outline = str(conf.get("today_goal_outline_rgba", dft["today_goal_outline_rgba"]))
+    # colors / widths -> CSS変数（プレビューはここだけ差し替える）
+    css_vars = "\n    ".join(f"{k}: {v};" for k, v in _css_vars(conf).items())
 
     # bar sizing
     bar_gap = int(conf.get("bar_gap_px", 4))
     bar_min = int(conf.get("bar_min_px", 6))
     bar_max = int(conf.get("bar_max_px", 28))
 
+    # pan / zoom
+    pan_zoom = bool(conf.get("enable_pan_zoom", True))
+    perf = bool(conf.get("perf_instrumentation", False))
+    chunk_sizes = sorted(set(_CHUNK_SIZES) | {days})
+    start_ms = int(datetime.combine(start_day, datetime.min.time()).timestamp() * 1000)
+    # 取れなければ「ある」ことにしておく（実際に読んだチャンクの more で止まる）
+    home_more = _REFRESH.call(lambda: _has_history_before(start_ms), lambda: True) if pan_zoom else False
+    home_chunk = json.dumps(
+        {"o": 0, "n": days, "s": start_day.isoformat(), "c": counts, "more": home_more},
+        separators=(",", ":"),
+    )
+
+    # moving averages (0..100% of scale; x はJSでバー中心に合わせる)
+    ma_series: dict[str, List[float]] = {}
+    if show_ma and stats is not None:
+        ma_series["ma7"] = _moving_average(stats, 7)
+        if days >= 30:
+            ma_series["ma30"] = _moving_average(stats, 30)
+    ma_json = json.dumps({
+        k: [None if v is None else round(min(100.0, v * 100.0 / scale_max), 2) for v in vals]
+        for k, vals in ma_series.items()
+    })
+    ma_svg = ""
+    if ma_series:
+        ma_svg = (
+            "<svg id='lm30-ma' preserveAspectRatio='none'>"
+            + "".join(f"<polyline class='lm30-{k}' points=''></polyline>" for k in ma_series)
+            + "</svg>"
+        )
+
     return f"""
 <div id="lm30-container">
   <div id="lm30-head">
-    <div id="lm30-title">{title}</div>
+    <div id="lm30-title" title="{query_tip}">{title}</div>
     <div id="lm30-hover-val">—</div>
   </div>
+  {stats_html}
 
   <div id="lm30-chartwrap" style="height:{chart_h}px;">
     <div class="lm30-tick lm30-t0"><span>0</span></div>
@@ -305,15 +1040,19 @@ def _render_bar_chart_html(counts: List[int]) -> str:
 
     <div id="lm30-chart" style="height:{chart_h}px;">
       {''.join(bars)}
+      {''.join(forecast_bars)}
+      {ma_svg}
     </div>
   </div>
 </div>
 
 <style>
   #lm30-container {{
+    {css_vars}
+
     margin: 14px auto;
     padding: 14px 16px;
-    border: 1px solid {container_border};
+    border: 1px solid var(--lm30-border);
     border-radius: 12px;
     max-width: 1200px;
   }}
@@ -339,8 +1078,13 @@ def _render_bar_chart_html(counts: List[int]) -> str:
     font-weight: 600;
   }}
 
+  #lm30-stats {{
+    font-size: 12px;
+    opacity: 0.75;
+    margin: -4px 0 10px;
+  }}
+
   #lm30-chartwrap {{
-    --lm30-chart-w: {chart_width_vw}vw;
     --lm30-bar-w: 14px;   /* JSで上書き */
     --lm30-gap: {bar_gap}px;
 
@@ -351,8 +1095,8 @@ def _render_bar_chart_html(counts: List[int]) -> str:
 
   #lm30-chart {{
     width: var(--lm30-chart-w);
-    max-width: {max_w}px;
-    min-width: {min_w}px;
+    max-width: var(--lm30-max-w);
+    min-width: var(--lm30-min-w);
 
     display: flex;
     align-items: flex-end;
@@ -367,7 +1111,7 @@ def _render_bar_chart_html(counts: List[int]) -> str:
     position: absolute;
     left: 0;
     width: 100%;
-    border-top: 1px dashed {tick_rgba};
+    border-top: 1px dashed var(--lm30-tick);
     pointer-events: none;
   }}
 
@@ -388,7 +1132,7 @@ def _render_bar_chart_html(counts: List[int]) -> str:
     position: absolute;
     left: 0;
     width: 100%;
-    border-top: 2px solid {goal_line};
+    border-top: 2px solid var(--lm30-goal-line);
     pointer-events: none;
   }}
   .lm30-goal span {{
@@ -397,37 +1141,71 @@ def _render_bar_chart_html(counts: List[int]) -> str:
     top: -18px;
     font-size: 11px;
     font-weight: 600;
-    opacity: {goal_label_opacity};
+    opacity: var(--lm30-goal-label-opacity);
   }}
 
   .lm-bar {{
     display: block;
     width: var(--lm30-bar-w);
     margin-right: var(--lm30-gap);
-    background: {bar_rgba};
+    background: var(--lm30-bar);
     border-radius: 3px;
   }}
 
-  #lm30-chart .lm-bar:last-child {{
+  /* 移動平均の svg が最後の子になるので :last-child ではなく型で数える（バーは全部 div） */
+  #lm30-chart .lm-bar:last-of-type {{
     margin-right: 0;
   }}
 
   .lm-today {{
-    background: {today_bar};
-    outline: 1px solid {today_outline};
+    background: var(--lm30-today);
+    outline: 1px solid var(--lm30-today-outline);
   }}
 
   /* ゴール以上のバー */
   .lm-goalmet {{
-    background: {goal_met_bar};
-    outline: 1px solid {goal_met_outline};
+    background: var(--lm30-goalmet);
+    outline: 1px solid var(--lm30-goalmet-outline);
   }}
 
   /* 今日 + ゴール達成（最強状態） */
   .lm-today.lm-goalmet {{
-    background: {today_goal_bar};
-    outline: 2px solid {today_goal_outline};
+    background: var(--lm30-today-goal);
+    outline: 2px solid var(--lm30-today-goal-outline);
+  }}
+
+  /* これからの予定（今日より右） */
+  .lm-forecast {{
+    background: var(--lm30-forecast);
+    outline: 1px dashed var(--lm30-bar);
+  }}
+  .lm-forecast.lm-over {{
+    background: var(--lm30-forecast-over);
+  }}
+
+  /* 過去を見ている間は「今」の統計と移動平均を隠す */
+  .lm30-panned #lm30-ma,
+  .lm30-panned #lm30-stats {{
+    display: none;
   }}
+
+  /* 移動平均線（バーの上に重ねる） */
+  #lm30-ma {{
+    position: absolute;
+    left: 0;
+    top: 0;
+    width: 100%;
+    height: 100%;
+    pointer-events: none;
+    overflow: visible;
+  }}
+  #lm30-ma polyline {{
+    fill: none;
+    stroke-width: 2;
+    stroke-linejoin: round;
+  }}
+  .lm30-ma7  {{ stroke: var(--lm30-ma7); }}
+  .lm30-ma30 {{ stroke: var(--lm30-ma30); stroke-dasharray: 4 3; }}
 </style>
 
 <script>
@@ -455,7 +1233,7 @@ def _render_bar_chart_html(counts: List[int]) -> str:
 
   function recompute() {{
     const w = chart.clientWidth;
-    const n = {days};
+    const n = Math.max(1, chart.querySelectorAll(".lm-bar").length);
     const gap = {bar_gap};
     const totalGap = gap * (n - 1);
 
@@ -464,11 +1242,477 @@ def _render_bar_chart_html(counts: List[int]) -> str:
 
     wrap.style.setProperty("--lm30-bar-w", bar + "px");
     wrap.style.setProperty("--lm30-gap", gap + "px");
+    drawMovingAverages();
+  }}
+
+  const ma = {ma_json};
+  function drawMovingAverages() {{
+    const svg = document.getElementById("lm30-ma");
+    if (!svg) return;
+    const bars = chart.querySelectorAll(".lm-bar");
+    const h = chart.clientHeight;
+    for (const key in ma) {{
+      const line = svg.querySelector(".lm30-" + key);
+      const vals = ma[key];
+      if (!line) continue;
+      const pts = [];
+      for (let i = 0; i < vals.length && i < bars.length; i++) {{
+        if (vals[i] === null) continue;  // 窓が揃う前の日は線を引かない
+        const b = bars[i];
+        const x = b.offsetLeft + b.offsetWidth / 2;
+        const y = h - (h * vals[i] / 100);
+        pts.push(x.toFixed(1) + "," + y.toFixed(1));
+      }}
+      line.setAttribute("points", pts.join(" "));
+    }}
+  }}
+
+  // ---- 計測（perf_instrumentation）：結果は pycmd("lm30:perf:...") で Python へ ----
+  const PERF = {str(perf).lower()} && typeof pycmd === "function";
+  const t0 = performance.now();  // ここまでにページと埋め込み CSS の解析が済んでいる
+  function perfSend(k, ms, extra) {{
+    if (!PERF) return;
+    const d = Object.assign({{ k: k, ms: ms, bars: chart.querySelectorAll(".lm-bar").length }}, extra || {{}});
+    pycmd("lm30:perf:" + JSON.stringify(d));
+  }}
+
+  // リサイズは回数が多いので、まとめて 500ms 後に1回送る
+  let rs = {{ n: 0, total: 0, max: 0 }}, rsTimer = null;
+  function onResize() {{
+    if (!PERF) {{ recompute(); return; }}
+    const t = performance.now();
+    recompute();
+    void chart.offsetHeight;  // レイアウトまで含めて測る
+    const ms = performance.now() - t;
+    rs.n += 1; rs.total += ms; rs.max = Math.max(rs.max, ms);
+    clearTimeout(rsTimer);
+    rsTimer = setTimeout(() => {{
+      perfSend("resize", rs.total, {{ n: rs.n, max: rs.max }});
+      rs = {{ n: 0, total: 0, max: 0 }};
+    }}, 500);
+  }}
+
+  if (PERF) {{
+    perfSend("script_start", t0);
+    const l0 = performance.now();
+    recompute();
+    void chart.offsetHeight;
+    perfSend("layout", performance.now() - l0);
+    try {{
+      new PerformanceObserver((list) => {{
+        for (const e of list.getEntries()) perfSend(e.name, e.startTime);
+      }}).observe({{ type: "paint", buffered: true }});
+    }} catch (e) {{}}
+    // チャートを含む最初のフレームが出るまで
+    requestAnimationFrame(() => requestAnimationFrame(() => perfSend("first_frame", performance.now() - t0)));
+  }} else {{
+    recompute();
+  }}
+  window.addEventListener("resize", onResize);
+
+  // ---- pan / zoom：古い範囲は pycmd で1チャンクずつ取りに行く ----
+  const root = document.getElementById("lm30-container");
+  const titleEl = document.getElementById("lm30-title");
+  if (!{str(pan_zoom).lower()} || !root || typeof pycmd !== "function") return;
+
+  const H = {chart_h};
+  const GOAL = {goal};
+  const SHOW_GOAL = {str(show_goal).lower()};
+  const SIZES = {json.dumps(chunk_sizes)};
+  const HOME_N = {days};
+  const FORECAST = {json.dumps(forecast)};
+  const homeTitle = titleEl ? titleEl.textContent : "";
+
+  // 表示中 + 先読み1つだけ持つ
+  const chunks = new Map();
+  const home = {home_chunk};
+  chunks.set("0:" + HOME_N, home);
+  let view = {{ o: 0, n: HOME_N, more: home.more }};
+  let busy = false;
+
+  function key(o, n) {{ return o + ":" + n; }}
+
+  function fetchChunk(o, n, cb) {{
+    const k = key(o, n);
+    if (chunks.has(k)) {{ if (cb) cb(chunks.get(k)); return; }}
+    pycmd("lm30:chunk:" + o + ":" + n, (res) => {{
+      const ch = (typeof res === "string") ? JSON.parse(res) : res;
+      if (!ch || !ch.c) {{ if (cb) cb(null); return; }}
+      chunks.set(k, ch);
+      if (cb) cb(ch);
+    }});
+  }}
+
+  function pad(x) {{ return (x < 10 ? "0" : "") + x; }}
+  function iso(d) {{ return d.getFullYear() + "-" + pad(d.getMonth() + 1) + "-" + pad(d.getDate()); }}
+
+  function render(ch) {{
+    const c = ch.c;
+    const fc = (ch.o === 0) ? FORECAST : [];
+    let maxv = 0, total = 0;
+    for (const v of c) {{ if (v > maxv) maxv = v; total += v; }}
+    for (const v of fc) {{ if (v > maxv) maxv = v; }}
+    const scale = Math.max(1, maxv, SHOW_GOAL ? GOAL : 0);
+    const p = ch.s.split("-").map(Number);
+    const atHome = (ch.o === 0 && c.length === HOME_N);
+
+    let html = "";
+    let last = ch.s;
+    for (let i = 0; i < c.length; i++) {{
+      const v = c[i];
+      last = iso(new Date(p[0], p[1] - 1, p[2] + i));
+      let cls = "lm-bar";
+      if (GOAL > 0 && v >= GOAL) cls += " lm-goalmet";
+      if (ch.o === 0 && i === c.length - 1) cls += " lm-today";
+      const h = Math.max(1, Math.floor(H * v / scale));
+      html += "<div class='" + cls + "' data-date='" + last + "' data-count='" + v + "' style='height:" + h + "px;'></div>";
+    }}
+    for (let i = 0; i < fc.length; i++) {{
+      const v = fc[i];
+      const d = iso(new Date(p[0], p[1] - 1, p[2] + c.length + i));
+      const cls = "lm-bar lm-forecast" + ((GOAL > 0 && v > GOAL) ? " lm-over" : "");
+      const h = Math.max(1, Math.floor(H * v / scale));
+      html += "<div class='" + cls + "' data-date='" + d + "' data-count='" + v + "' style='height:" + h + "px;'></div>";
+    }}
+
+    const svg = document.getElementById("lm30-ma");
+    chart.innerHTML = html;
+    if (svg) chart.appendChild(svg);
+
+    const t50 = wrap.querySelector(".lm30-t50 span");
+    const t100 = wrap.querySelector(".lm30-t100 span");
+    if (t50) t50.textContent = Math.round(scale / 2);
+    if (t100) t100.textContent = scale;
+    const g = wrap.querySelector(".lm30-goal");
+    if (g) g.style.bottom = Math.max(0, Math.min(100, GOAL / scale * 100)) + "%";
+
+    if (titleEl) titleEl.textContent = atHome ? homeTitle : (ch.s + " – " + last + ": " + total + " reviews");
+    root.classList.toggle("lm30-panned", !atHome);
+    recompute();
+  }}
+
+  function show(o, n, dir) {{
+    if (busy) return;
+    busy = true;
+    fetchChunk(o, n, (ch) => {{
+      busy = false;
+      if (!ch) return;
+      view = {{ o: o, n: n, more: ch.more }};
+      render(ch);
+
+      // 進む向きの隣だけ先読みし、それ以外は捨てる
+      const keep = [key(o, n)];
+      let nb = null;
+      if (dir >= 0 && ch.more) nb = [o + n, n];
+      else if (dir < 0 && o > 0) nb = [Math.max(0, o - n), n];
+      if (nb) keep.push(key(nb[0], nb[1]));
+      for (const k of Array.from(chunks.keys())) if (!keep.includes(k)) chunks.delete(k);
+      if (nb) fetchChunk(nb[0], nb[1], null);
+    }});
+  }}
+
+  function older() {{ if (view.more) show(view.o + view.n, view.n, 1); }}
+  function newer() {{ if (view.o > 0) show(Math.max(0, view.o - view.n), view.n, -1); }}
+
+  function zoom(step) {{
+    let i = SIZES.indexOf(view.n);
+    if (i < 0) i = SIZES.indexOf(HOME_N);
+    const j = Math.max(0, Math.min(SIZES.length - 1, i + step));
+    if (j !== i) show(view.o, SIZES[j], 0);
+  }}
+
+  let acc = 0;
+  wrap.addEventListener("wheel", (e) => {{
+    if (e.ctrlKey) {{
+      e.preventDefault();
+      zoom(e.deltaY > 0 ? 1 : -1);
+      return;
+    }}
+    const d = e.shiftKey ? e.deltaY : e.deltaX;
+    if (!e.shiftKey && Math.abs(e.deltaX) <= Math.abs(e.deltaY)) return;  // 縦スクロールはページへ
+    e.preventDefault();
+    acc += d;
+    if (acc <= -60) {{ acc = 0; older(); }}
+    else if (acc >= 60) {{ acc = 0; newer(); }}
+  }}, {{ passive: false }});
+
+  let dragX = null;
+  wrap.addEventListener("mousedown", (e) => {{ dragX = e.clientX; }});
+  window.addEventListener("mouseup", () => {{ dragX = null; }});
+  wrap.addEventListener("mousemove", (e) => {{
+    if (dragX === null) return;
+    const dx = e.clientX - dragX;
+    if (dx > 60) {{ dragX = e.clientX; older(); }}
+    else if (dx < -60) {{ dragX = e.clientX; newer(); }}
+  }});
+
+  // ダブルクリックで今日に戻る
+  wrap.addEventListener("dblclick", () => {{
+    if (view.o !== 0 || view.n !== HOME_N) show(0, HOME_N, -1);
+  }});
+}})();
+</script>
+"""
+
+
+# -------------------- refresh service (single-flight) --------------------
+
+class _RefreshService:
+    """
+    counts / forecast の再計算を1本にまとめる。
+
+    - request(): バックグラウンドで引き直す。実行中に来た要求は「次の1回」にまとめ、
+      その回の結果を全員に渡す。
+    - read(): 描画用。実行中の計算があれば終わるのを待ってからキャッシュを読むので、
+      同じクエリを2回走らせない。
+    このアドオンからのコレクションアクセスは全部 lock の中で行う（書き出しは _LockedDB で
+    クエリ1回ずつ）。GUI スレッドからは call() で、待ちすぎずに取る。
+    """
+
+    WAIT_TIMEOUT = 5.0  # 描画側が待つ上限（秒）。超えたら保存済みキャッシュで描く
+
+    def __init__(self) -> None:
+        self.lock = threading.RLock()
+        self._cv = threading.Condition()
+        self._running = False
+        self._full = False
+        self._waiters: list = []
+        self._pending = False
+        self._pending_full = False
+        self._pending_waiters: list = []
+
+    def request(self, on_done=None, full: bool = False) -> None:
+        with self._cv:
+            if self._running:
+                self._pending = True
+                self._pending_full = self._pending_full or full
+                if on_done is not None:
+                    self._pending_waiters.append(on_done)
+                return
+            self._running = True
+            self._full = full
+            self._waiters = [on_done] if on_done is not None else []
+        try:
+            mw.taskman.run_in_background(self._run)
+        except Exception:
+            self._run()
+
+    def _run(self) -> None:
+        while True:
+            with self._cv:
+                full = self._full
+            try:
+                with self.lock:
+                    if full:
+                        # 同期で締まった日も変わりうる：デッキ別・過去チャンクのキャッシュも捨てる
+                        _clear_deck_cache()
+                        _clear_history_cache()
+                    result = (_get_cached_counts(force=True, full=full), _get_cached_forecast())
+            except Exception:
+                result = None
+
+            with self._cv:
+                waiters = self._waiters
+                if self._pending:
+                    # 走っている間に来た要求をまとめて、もう1回だけ回す
+                    self._full = self._pending_full
+                    self._waiters = self._pending_waiters
+                    self._pending = False
+                    self._pending_full = False
+                    self._pending_waiters = []
+                else:
+                    self._running = False
+                    self._waiters = []
+                    self._cv.notify_all()
+                again = self._running
+
+            for cb in waiters:
+                mw.taskman.run_on_main(lambda cb=cb: cb(result))
+            if not again:
+                return
+
+    def read(self) -> tuple[List[int], List[int]]:
+        with self._cv:
+            if self._running and not self._cv.wait_for(lambda: not self._running, timeout=self.WAIT_TIMEOUT):
+                # まだ走っている＝lock も握られている。もう一度待つと合計で倍になるので、ここで諦める
+                return _peek_cached()
+        return self.call(lambda: (_get_cached_counts(), _get_cached_forecast()), _peek_cached)
+
+    def call(self, fn, fallback):
+        """
+        GUI スレッド用：lock を WAIT_TIMEOUT まで待って fn() を呼ぶ。
+        取れなければ（長い再計算や書き出しの最中）DB に触らない fallback() で済ませる。
+        """
+        if not self.lock.acquire(timeout=self.WAIT_TIMEOUT):
+            return fallback()
+        try:
+            return fn()
+        finally:
+            self.lock.release()
+
+
+def _peek_cached() -> tuple[List[int], List[int]]:
+    # DBに触らず、保存済みのキャッシュだけ返す
+    c = _get_conf()
+    try:
+        counts = [int(x) for x in c.get("cache_counts") or []]
+        forecast = [int(x) for x in c.get("forecast_counts") or []]
+    except Exception:
+        return [], []
+    return counts, forecast[: max(0, int(_cfg("forecast_days", 0) or 0))]
+
+
+_REFRESH = _RefreshService()
+
+
+def _redraw_deck_browser(_result=None) -> None:
+    try:
+        if getattr(mw, "state", None) == "deckBrowser":
+            mw.deckBrowser.refresh()
+    except Exception:
+        pass
+
+
+# -------------------- reviewer mini chart (in-memory, no SQL per answer) --------------------
+
+# day: 今日のキー / days: 直近7日（最後が今日）/ goal: 目標（回答ごとに設定を読まない）
+_LIVE: dict[str, Any] = {}
+
+
+def _live_seed(counts: List[int] | None = None) -> None:
+    """キャッシュ済みの counts から7日分を用意する（回答ごとではなく、ここだけ）。"""
+    if counts is None:
+        counts, _forecast = _REFRESH.read()
+    last7 = ([0] * 7 + [int(x) for x in counts])[-7:]
+    _LIVE.clear()
+    _LIVE.update({
+        "day": _today_key(),
+        "days": last7,
+        "goal": int(_cfg("goal_per_day", 200) or 0),
+    })
+
+
+def _live_values() -> List[int]:
+    if not _LIVE:
+        _live_seed()
+    # 復習中に日付が変わったら1日ずらす
+    if _LIVE.get("day") != _today_key():
+        _LIVE["days"] = _LIVE["days"][1:] + [0]
+        _LIVE["day"] = _today_key()
+    return _LIVE["days"]
+
+
+def _live_push() -> None:
+    try:
+        web = mw.reviewer.bottom.web
+        web.eval(f"window.lm30Live && lm30Live({json.dumps(_live_values())}, {int(_LIVE.get('goal', 0))});")
+    except Exception:
+        pass
+
+
+def _live_reseed(result=None) -> None:
+    # バックグラウンド再計算の結果が来たら、そちらを正とする
+    if result and _LIVE:
+        _live_seed(result[0])
+        _live_push()
+
+
+def _live_on_answer(*args, **kwargs) -> None:
+    if not _LIVE:
+        return  # 下のバーに出していない
+    _live_values()[-1] += 1
+    _live_push()
+
+
+def _live_on_undo(*args, **kwargs) -> None:
+    # 取り消したのが回答とは限らないので、減らさずに数え直す（rollup なので今日だけ）
+    if not _LIVE:
+        return
+    _mark_dirty()
+    _REFRESH.request(on_done=_live_reseed)
+
+
+def _render_live_html() -> str:
+    conf = _get_config_merged()
+    # 手元のカウンタの方がキャッシュより新しいので、日が変わった時だけ作り直す
+    if not _LIVE or _LIVE.get("day") != _today_key():
+        _live_seed()
+    _LIVE["goal"] = int(conf.get("goal_per_day", 200) or 0)
+    css_vars = " ".join(f"{k}: {v};" for k, v in _css_vars(conf).items())
+    return f"""
+<div id="lm30-live" title="Today vs goal · last 7 days">
+  <div id="lm30-live-bar"><div id="lm30-live-fill"></div></div>
+  <span id="lm30-live-txt"></span>
+  <svg id="lm30-live-spark" width="56" height="14" viewBox="0 0 56 14"><polyline points=""></polyline></svg>
+</div>
+
+<style>
+  #lm30-live {{
+    {css_vars}
+    display: inline-flex;
+    align-items: center;
+    gap: 6px;
+    margin-left: 6px;
+    vertical-align: middle;
+    font-size: 10px;
+    opacity: 0.85;
+    pointer-events: none;
+  }}
+  @media (max-width: 600px) {{
+    #lm30-live-spark {{ display: none; }}
+  }}
+  #lm30-live-bar {{
+    width: 60px;
+    height: 5px;
+    border-radius: 3px;
+    background: var(--lm30-tick);
+    overflow: hidden;
+  }}
+  #lm30-live-fill {{
+    height: 100%;
+    width: 0;
+    background: var(--lm30-today);
+  }}
+  #lm30-live.lm30-live-met #lm30-live-fill {{
+    background: var(--lm30-today-goal);
   }}
+  #lm30-live-spark polyline {{
+    fill: none;
+    stroke: var(--lm30-bar);
+    stroke-width: 1.5;
+  }}
+</style>
 
-  recompute();
-  window.addEventListener("resize", recompute);
+<script>
+window.lm30Live = function(days, goal) {{
+  const root = document.getElementById("lm30-live");
+  if (!root) return;
+  const today = days[days.length - 1] || 0;
+  const fill = document.getElementById("lm30-live-fill");
+  const txt = document.getElementById("lm30-live-txt");
+  const line = root.querySelector("#lm30-live-spark polyline");
+
+  const pct = goal > 0 ? Math.min(100, today * 100 / goal) : 100;
+  fill.style.width = pct + "%";
+  root.classList.toggle("lm30-live-met", goal > 0 && today >= goal);
+  txt.textContent = goal > 0 ? (today + "/" + goal) : String(today);
+
+  let maxv = 1;
+  for (const v of days) if (v > maxv) maxv = v;
+  const step = days.length > 1 ? 56 / (days.length - 1) : 0;
+  const pts = [];
+  for (let i = 0; i < days.length; i++) {{
+    pts.push((i * step).toFixed(1) + "," + (13 - 12 * days[i] / maxv).toFixed(1));
+  }}
+  line.setAttribute("points", pts.join(" "));
+}};
+(function() {{
+  // 右端のセルのタイマーの隣へ（左の Edit ボタンや真ん中の回答ボタンには重ねない）
+  const root = document.getElementById("lm30-live");
+  const timer = document.getElementById("time");
+  if (root && timer && timer.parentNode) timer.parentNode.insertBefore(root, timer.nextSibling);
 }})();
+lm30Live({json.dumps(_live_values())}, {int(_LIVE.get("goal", 0))});
 </script>
 """
 
@@ -478,6 +1722,7 @@ def _render_bar_chart_html(counts: List[int]) -> str:
 def _mark_dirty(*args, **kwargs) -> None:
     global _DIRTY
     _DIRTY = True
+    _invalidate_forecast()
 
 
 def _reviewer_will_end() -> None:
@@ -485,7 +1730,21 @@ def _reviewer_will_end() -> None:
     if not _DIRTY:
         return
     _DIRTY = False
-    _get_cached_counts(force=True)
+    _mark_deck_cache_stale()
+    _REFRESH.request(on_done=_live_reseed)
+
+
+def _on_sync_did_finish() -> None:
+    # 他の端末の過去の日ぶんも入ってくるので、締まった日も含めて引き直す
+    # デッキ別・過去チャンクのキャッシュは、バックグラウンドの再計算が lock の中で捨てる
+    _invalidate_forecast()
+    _REFRESH.request(on_done=_after_sync_refresh, full=True)
+
+
+def _after_sync_refresh(result=None) -> None:
+    # 他の端末での復習も今日の数に入ったので、下のバーの手元カウンタも数え直した値にする
+    _live_reseed(result)
+    _redraw_deck_browser(result)
 
 
 def _on_webview_will_set_content(web_content, context) -> None:
@@ -494,25 +1753,66 @@ def _on_webview_will_set_content(web_content, context) -> None:
     try:
         if context is None:
             return
+        if context.__class__.__name__ == "ReviewerBottomBar":
+            if bool(_cfg("reviewer_mini_chart", True)):
+                web_content.body += _render_live_html()
+            return
+        if context.__class__.__name__ == "Overview":
+            if bool(_cfg("show_on_overview", True)):
+                web_content.body += _render_overview_chart_html()
+            return
         if context.__class__.__name__ != "DeckBrowser":
             return
 
-        counts = _get_cached_counts()
-        web_content.body += _render_bar_chart_html(counts)
+        t0 = time.perf_counter()
+        counts, forecast = _REFRESH.read()
+        t1 = time.perf_counter()
+        web_content.body += _render_bar_chart_html(counts, forecast=forecast)
+        if _perf_enabled():
+            bars = len(counts) + len(forecast)
+            _perf_add("py_read", bars, (t1 - t0) * 1000.0)
+            _perf_add("py_render", bars, (time.perf_counter() - t1) * 1000.0)
     except Exception:
         return
 
 
+def _render_overview_chart_html() -> str:
+    did = int(mw.col.decks.get_current_id())
+    ent = _REFRESH.call(lambda: _get_deck_counts(did), lambda: _peek_deck_counts(did))
+    if ent is None:
+        return ""  # 再計算中で、このデッキの保存済みの値も無い
+    name = str(mw.col.decks.name(did))
+
+    # 全体用の pan/zoom チャンクはデッキで絞っていないので、ここでは使わない
+    conf = _get_config_merged()
+    conf["enable_pan_zoom"] = False
+    conf["cache_query"] = ent["query"]
+    return _render_bar_chart_html(list(ent["counts"]), conf, label=name.split("::")[-1], stats=ent["stats"])
+
+
 def _install_hooks() -> None:
     if gui_hooks is not None:
         if hasattr(gui_hooks, "webview_will_set_content"):
             gui_hooks.webview_will_set_content.append(_on_webview_will_set_content)
 
+        if hasattr(gui_hooks, "webview_did_receive_js_message"):
+            gui_hooks.webview_did_receive_js_message.append(_on_js_message)
+
         if hasattr(gui_hooks, "reviewer_did_answer_card"):
             gui_hooks.reviewer_did_answer_card.append(_mark_dirty)
+            gui_hooks.reviewer_did_answer_card.append(_live_on_answer)
 
         if hasattr(gui_hooks, "reviewer_will_end"):
             gui_hooks.reviewer_will_end.append(_reviewer_will_end)
+
+        if hasattr(gui_hooks, "state_did_undo"):
+            gui_hooks.state_did_undo.append(_live_on_undo)
+
+        if hasattr(gui_hooks, "sync_did_finish"):
+            gui_hooks.sync_did_finish.append(_on_sync_did_finish)
+
+        if hasattr(gui_hooks, "operation_did_execute"):
+            gui_hooks.operation_did_execute.append(_on_operation_did_execute)
         return
 
     try:
@@ -520,6 +1820,7 @@ def _install_hooks() -> None:
         addHook("webviewWillSetContent", lambda wc, ctx: _on_webview_will_set_content(wc, ctx))
         addHook("reviewerDidAnswerCard", lambda *a, **k: _mark_dirty(*a, **k))
         addHook("reviewerWillEnd", lambda: _reviewer_will_end())
+        addHook("revertedCard", lambda *a: _live_on_undo())
     except Exception:
         pass
 
@@ -535,6 +1836,8 @@ class ConfigDialog(QDialog):
         - Preview swatch
         - Hidden QLineEdit that stores rgba(r,g,b,a) for backward-compatible save logic
         """
+        changed = pyqtSignal()
+
         def __init__(self, label: str, rgba_text: str, parent=None) -> None:
             super().__init__(parent)
 
@@ -602,6 +1905,7 @@ class ConfigDialog(QDialog):
             self._alpha_pct = int(self.alpha_spin.value())
             self.hidden_le.setText(self._fmt_rgba(self._rgb, self._alpha_pct))
             self._set_preview()
+            self.changed.emit()
 
         def _pick_rgb(self) -> None:
             col = QColorDialog.getColor(self._rgb, self, "Pick Color")
@@ -615,6 +1919,7 @@ class ConfigDialog(QDialog):
             self.alpha_spin.setValue(self._alpha_pct)
             self.hidden_le.setText(self._fmt_rgba(self._rgb, self._alpha_pct))
             self._set_preview()
+            self.changed.emit()
 
         def rgba_text(self) -> str:
             return str(self.hidden_le.text()).strip()
@@ -675,7 +1980,55 @@ class ConfigDialog(QDialog):
 
         form_g.addRow("Range", self.range_combo)
 
+        self.forecast_combo = QComboBox()
+        self.forecast_combo.addItem("Off", 0)
+        self.forecast_combo.addItem("Next 7 days", 7)
+        self.forecast_combo.addItem("Next 30 days", 30)
+        fi = self.forecast_combo.findData(int(self._conf.get("forecast_days", 0) or 0))
+        self.forecast_combo.setCurrentIndex(fi if fi >= 0 else 0)
+        form_g.addRow("Due forecast", self.forecast_combo)
+
+        self.overview_cb = QCheckBox()
+        self.overview_cb.setChecked(bool(self._conf.get("show_on_overview", True)))
+        form_g.addRow("Per-deck chart on deck overview", self.overview_cb)
+
+        self.live_cb = QCheckBox()
+        self.live_cb.setChecked(bool(self._conf.get("reviewer_mini_chart", True)))
+        form_g.addRow("Mini chart while reviewing", self.live_cb)
+
+        self.pan_zoom_cb = QCheckBox()
+        self.pan_zoom_cb.setChecked(bool(self._conf.get("enable_pan_zoom", True)))
+        form_g.addRow("Browse history (drag / Ctrl+wheel)", self.pan_zoom_cb)
+
         gl.addWidget(box_general)
+
+        box_stats = QGroupBox("Stats")
+        form_s = QFormLayout(box_stats)
+        form_s.setVerticalSpacing(10)
+
+        self.stats_cb = QCheckBox()
+        self.stats_cb.setChecked(bool(self._conf.get("show_stats", True)))
+        form_s.addRow("Show stats strip", self.stats_cb)
+
+        self.ma_cb = QCheckBox()
+        self.ma_cb.setChecked(bool(self._conf.get("show_moving_avg", True)))
+        form_s.addRow("Show moving averages", self.ma_cb)
+
+        gl.addWidget(box_stats)
+
+        box_diag = QGroupBox("Diagnostics")
+        form_d = QFormLayout(box_diag)
+        form_d.setVerticalSpacing(10)
+
+        self.perf_cb = QCheckBox()
+        self.perf_cb.setChecked(bool(self._conf.get("perf_instrumentation", False)))
+        form_d.addRow("Collect rendering timings", self.perf_cb)
+
+        self.perf_btn = QPushButton("Show timings…")
+        self.perf_btn.clicked.connect(self.on_show_timings)
+        form_d.addRow("", self.perf_btn)
+
+        gl.addWidget(box_diag)
         gl.addStretch(1)
 
         tabs.addTab(tab_general, "General")
@@ -805,15 +2158,46 @@ class ConfigDialog(QDialog):
         )
         form_c.addRow("Today + Goal outline", self.today_goal_outline_picker)
 
+        self.ma7_picker = ConfigDialog.RGBAPickerRow(
+            "7-day average line",
+            str(self._conf.get("ma7_rgba", dft["ma7_rgba"])),
+        )
+        form_c.addRow("7-day average line", self.ma7_picker)
+
+        self.ma30_picker = ConfigDialog.RGBAPickerRow(
+            "30-day average line",
+            str(self._conf.get("ma30_rgba", dft["ma30_rgba"])),
+        )
+        form_c.addRow("30-day average line", self.ma30_picker)
+
+        self.forecast_picker = ConfigDialog.RGBAPickerRow(
+            "Forecast bar color",
+            str(self._conf.get("forecast_bar_rgba", dft["forecast_bar_rgba"])),
+        )
+        form_c.addRow("Forecast bar color", self.forecast_picker)
+
+        self.forecast_over_picker = ConfigDialog.RGBAPickerRow(
+            "Forecast over goal",
+            str(self._conf.get("forecast_over_goal_rgba", dft["forecast_over_goal_rgba"])),
+        )
+        form_c.addRow("Forecast over goal", self.forecast_over_picker)
+
         cl.addWidget(box_colors)
         cl.addStretch(1)
 
         tabs.addTab(tab_colors, "Colors")
 
+        # -------------------- preview --------------------
+        self._build_preview(root)
+
         # -------------------- buttons --------------------
         btns = QHBoxLayout()
         btns.addStretch(1)
 
+        self.export_btn = QPushButton("Export history…")
+        self.export_btn.clicked.connect(self.on_export)
+        btns.addWidget(self.export_btn)
+
         self.reset_btn = QPushButton("Reset to defaults")
         self.reset_btn.clicked.connect(self.on_reset)
         btns.addWidget(self.reset_btn)
@@ -829,6 +2213,120 @@ class ConfigDialog(QDialog):
 
         root.addLayout(btns)
 
+        self._connect_preview()
+        self._apply_preview()
+
+    # -------------------- live preview (cached counts only, no DB) --------------------
+
+    def _build_preview(self, root: QVBoxLayout) -> None:
+        self.preview_web = None
+        try:
+            from aqt.webview import AnkiWebView  # type: ignore
+
+            box_preview = QGroupBox("Preview")
+            pv = QVBoxLayout(box_preview)
+            pv.setContentsMargins(8, 8, 8, 8)
+            self.preview_web = AnkiWebView(parent=self, title="bar graph preview")
+            self.preview_web.setMinimumHeight(260)
+            pv.addWidget(self.preview_web)
+            root.addWidget(box_preview)
+        except Exception:
+            self.preview_web = None
+
+        # 連続した変更は 150ms にまとめて1回だけ反映する
+        self._preview_full = True
+        self._preview_timer = QTimer(self)
+        self._preview_timer.setSingleShot(True)
+        self._preview_timer.setInterval(150)
+        self._preview_timer.timeout.connect(self._apply_preview)
+
+    def _connect_preview(self) -> None:
+        # 形が変わるもの -> 作り直し
+        for sb in (self.goal_spin, self.height_spin, self.gap_spin, self.bmin_spin, self.bmax_spin):
+            sb.valueChanged.connect(lambda _v: self._schedule_preview(True))
+        for cb in (self.goal_line_cb, self.stats_cb, self.ma_cb):
+            cb.toggled.connect(lambda _v: self._schedule_preview(True))
+        self.range_combo.currentIndexChanged.connect(lambda _i: self._schedule_preview(True))
+        self.forecast_combo.currentIndexChanged.connect(lambda _i: self._schedule_preview(True))
+
+        # 色と幅 -> CSS変数だけ
+        for sb in (self.width_vw_spin, self.minw_spin, self.maxw_spin):
+            sb.valueChanged.connect(lambda _v: self._schedule_preview(False))
+        for picker in (
+            self.bar_picker, self.today_picker, self.goal_line_picker, self.tick_picker,
+            self.goalmet_picker, self.goalmet_outline_picker,
+            self.today_goal_picker, self.today_goal_outline_picker,
+            self.ma7_picker, self.ma30_picker,
+            self.forecast_picker, self.forecast_over_picker,
+        ):
+            picker.changed.connect(lambda: self._schedule_preview(False))
+
+    def _schedule_preview(self, full: bool) -> None:
+        self._preview_full = self._preview_full or full
+        self._preview_timer.start()
+
+    def _preview_counts(self, conf: dict[str, Any]) -> List[int]:
+        # 保存済みの cache_counts だけを使う（範囲が違えば古い側を0で埋める）
+        days = max(1, int(conf.get("range_days", 30) or 30))
+        try:
+            cached = [int(x) for x in self._conf.get("cache_counts") or []]
+        except Exception:
+            cached = []
+        return ([0] * days + cached)[-days:]
+
+    def _preview_forecast(self, conf: dict[str, Any]) -> List[int]:
+        # 予定も保存済みのキャッシュだけ（足りない日は0）
+        n = max(0, int(conf.get("forecast_days", 0) or 0))
+        try:
+            cached = [int(x) for x in self._conf.get("forecast_counts") or []]
+        except Exception:
+            cached = []
+        return (cached + [0] * n)[:n]
+
+    def _apply_preview(self) -> None:
+        if self.preview_web is None:
+            return
+        conf = self.get_new_conf(base=self._conf)
+        conf["enable_pan_zoom"] = False  # プレビューでは pycmd で過去を取りに行かない
+        conf["perf_instrumentation"] = False  # プレビューの時間は集計に混ぜない
+
+        if self._preview_full:
+            self._preview_full = False
+            page = _render_bar_chart_html(self._preview_counts(conf), conf, self._preview_forecast(conf))
+            self.preview_web.stdHtml(page, context=self)
+            return
+
+        self.preview_web.eval(
+            """
+            (function(v) {
+              const root = document.getElementById("lm30-container");
+              if (!root) return;
+              for (const k in v) root.style.setProperty(k, v[k]);
+              window.dispatchEvent(new Event("resize"));
+            })(%s);
+            """ % json.dumps(_css_vars(conf))
+        )
+
+    def on_show_timings(self) -> None:
+        try:
+            from aqt.utils import showText  # type: ignore
+            showText(perf_summary(), parent=self, title="Bar Graph - Timings")
+        except Exception:
+            pass
+
+    def on_export(self) -> None:
+        path, _flt = QFileDialog.getSaveFileName(
+            self,
+            "Export daily review history",
+            "review_history.csv",
+            "CSV (*.csv);;JSON (*.json)",
+        )
+        if not path:
+            return
+        if "JSON" in _flt and not path.lower().endswith(".json"):
+            path += ".json"
+        _export_in_background(self, path)
+
     def on_reset(self) -> None:
         d = _defaults()
         self.enabled_cb.setChecked(bool(d["enabled"]))
@@ -842,6 +2340,15 @@ class ConfigDialog(QDialog):
         idx = self.range_combo.findData(range_days)
         self.range_combo.setCurrentIndex(idx if idx >= 0 else 1)
 
+        fi = self.forecast_combo.findData(int(d["forecast_days"]))
+        self.forecast_combo.setCurrentIndex(fi if fi >= 0 else 0)
+        self.overview_cb.setChecked(bool(d["show_on_overview"]))
+        self.live_cb.setChecked(bool(d["reviewer_mini_chart"]))
+        self.pan_zoom_cb.setChecked(bool(d["enable_pan_zoom"]))
+        self.perf_cb.setChecked(bool(d["perf_instrumentation"]))
+        self.stats_cb.setChecked(bool(d["show_stats"]))
+        self.ma_cb.setChecked(bool(d["show_moving_avg"]))
+
         self.height_spin.setValue(int(d["chart_height_px"]))
         self.width_vw_spin.setValue(int(d["chart_width_vw"]))
         self.minw_spin.setValue(int(d["chart_min_width_px"]))
@@ -862,14 +2369,27 @@ class ConfigDialog(QDialog):
         self.today_goal_picker.set_rgba_text(str(d["today_goal_bar_rgba"]))
         self.today_goal_outline_picker.set_rgba_text(str(d["today_goal_outline_rgba"]))
 
+        self.ma7_picker.set_rgba_text(str(d["ma7_rgba"]))
+        self.ma30_picker.set_rgba_text(str(d["ma30_rgba"]))
+
+        self.forecast_picker.set_rgba_text(str(d["forecast_bar_rgba"]))
+        self.forecast_over_picker.set_rgba_text(str(d["forecast_over_goal_rgba"]))
+
 
-    def get_new_conf(self) -> dict[str, Any]:
-        c = _get_config_merged()
+    def get_new_conf(self, base: dict[str, Any] | None = None) -> dict[str, Any]:
+        c = dict(base) if base is not None else _get_config_merged()
 
         c["enabled"] = bool(self.enabled_cb.isChecked())
         c["goal_per_day"] = int(self.goal_spin.value())
         c["show_goal_line"] = bool(self.goal_line_cb.isChecked())
         c["range_days"] = int(self.range_combo.currentData() or 30)
+        c["forecast_days"] = int(self.forecast_combo.currentData() or 0)
+        c["show_on_overview"] = bool(self.overview_cb.isChecked())
+        c["reviewer_mini_chart"] = bool(self.live_cb.isChecked())
+        c["enable_pan_zoom"] = bool(self.pan_zoom_cb.isChecked())
+        c["perf_instrumentation"] = bool(self.perf_cb.isChecked())
+        c["show_stats"] = bool(self.stats_cb.isChecked())
+        c["show_moving_avg"] = bool(self.ma_cb.isChecked())
 
         c["chart_height_px"] = int(self.height_spin.value())
         c["chart_width_vw"] = int(self.width_vw_spin.value())
@@ -891,14 +2411,21 @@ class ConfigDialog(QDialog):
         c["today_goal_bar_rgba"] = self.today_goal_picker.rgba_text()
         c["today_goal_outline_rgba"] = self.today_goal_outline_picker.rgba_text()
 
+        c["ma7_rgba"] = self.ma7_picker.rgba_text()
+        c["ma30_rgba"] = self.ma30_picker.rgba_text()
+
+        c["forecast_bar_rgba"] = self.forecast_picker.rgba_text()
+        c["forecast_over_goal_rgba"] = self.forecast_over_picker.rgba_text()
+
         return c
 
 
 def _show_config_dialog() -> None:
     dlg = ConfigDialog(mw)
     if dlg.exec() == QDialog.DialogCode.Accepted:
-        new_conf = dlg.get_new_conf()
-        _write_conf(new_conf)
+        # 再計算のキャッシュ書き込みと混ざらないように、終わるまで待ってから保存する（まれな操作なので待つ）
+        with _REFRESH.lock:
+            _write_conf(dlg.get_new_conf())
 
 def _install_config_action() -> None:
     # 「アドオン設定画面の Config ボタン」から開く（Toolsメニューは増やさない）
@@ -0,0 +1,463 @@
+"""
+集計エンジン（aqt 不要）。
+
+アドオン本体（__init__.py）からも、コマンドラインのバッチ集計からも
+同じ関数を使うので、アプリ内と同じ結果になる。
+
+db には mw.col.db と同じく .all(sql, *args) を持つものを渡す。
+素の sqlite3 接続は SqliteDB で包めばよい。
+
+バッチ集計:
+
+    python aggregate.py PATH/collection.anki2 [...] --days 30 --out report.json --svg-dir charts/
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import pathlib
+import sqlite3
+import argparse
+
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from math import gcd
+from datetime import date, datetime, timedelta
+from typing import Any, Iterator, List, Optional
+
+# revlog.type -> 列名
+REVLOG_TYPES = {0: "learn", 1: "review", 2: "relearn", 3: "filtered", 4: "manual"}
+
+EXPORT_FIELDS = ["date", "count", "time_ms"] + list(REVLOG_TYPES.values())
+
+
+class SqliteDB:
+    """sqlite3 接続を mw.col.db っぽく見せる薄いラッパ。"""
+
+    def __init__(self, path: str) -> None:
+        # 読み取り専用で開く（Anki が開いていても書き換えない）
+        uri = pathlib.Path(path).resolve().as_uri() + "?mode=ro"
+        self.con = sqlite3.connect(uri, uri=True)
+
+    def all(self, sql: str, *args: Any) -> List[Any]:
+        return self.con.execute(sql, args).fetchall()
+
+    def close(self) -> None:
+        self.con.close()
+
+
+# -------------------- daily counts (strategies) --------------------
+
+def _local_midnight_ms(d: date) -> int:
+    return int(datetime.combine(d, datetime.min.time()).timestamp() * 1000)
+
+
+def day_bounds(days: int, today: date) -> List[int]:
+    """各日のローカル0時（ms）。長さ days+1、最後は明日の0時。DST もここで吸収する。"""
+    start_day = today - timedelta(days=days - 1)
+    return [_local_midnight_ms(start_day + timedelta(days=i)) for i in range(days + 1)]
+
+
+def deck_filter(dids: Optional[List[int]]) -> tuple[str, List[int]]:
+    """デッキ（とその子）に絞る条件。フィルターデッキに入っているカードは元デッキ側で数える。"""
+    if not dids:
+        return "", []
+    ids = [int(d) for d in dids]
+    marks = ",".join("?" * len(ids))
+    return f" AND cid IN (SELECT id FROM cards WHERE did IN ({marks}) OR odid IN ({marks}))", ids + ids
+
+
+def _bucket_width(bounds: List[int]) -> int:
+    # 全ての日境界を割り切る最大の幅（DST が無ければ1日＝86400000、あれば1時間など）。
+    # この幅で group by したバケットは必ずどれか1日に収まる。
+    width = 0
+    for b in bounds[1:]:
+        width = gcd(width, b - bounds[0])
+    return max(1, width)
+
+
+def _count_grouped(db, bounds: List[int], known: Optional[dict[int, int]],
+                   flt: tuple[str, List[int]] = ("", [])) -> List[int]:
+    # 1クエリで group by。バケットは日境界をまたがないので結果は probe と一致する。
+    start_ms = bounds[0]
+    width = _bucket_width(bounds)
+
+    rows = db.all(
+        """
+        SELECT ((id - ?) / ?) AS bucket, COUNT(*) AS cnt
+        FROM revlog
+        WHERE id >= ? AND id < ?""" + flt[0] + """
+        GROUP BY bucket
+        """,
+        start_ms, width, start_ms, bounds[-1], *flt[1],
+    )
+
+    days = len(bounds) - 1
+    counts = [0] * days
+    for bucket, cnt in rows:
+        try:
+            idx = bisect_right(bounds, start_ms + int(bucket) * width) - 1
+        except Exception:
+            continue
+        if 0 <= idx < days:
+            try:
+                counts[idx] += int(cnt)
+            except Exception:
+                pass
+    return counts
+
+
+def _probe_one(db, lo: int, hi: int, flt: tuple[str, List[int]]) -> int:
+    sql = "SELECT COUNT(*) FROM revlog WHERE id >= ? AND id < ?" + flt[0]
+    return int(db.all(sql, lo, hi, *flt[1])[0][0] or 0)
+
+
+def _count_probe(db, bounds: List[int], known: Optional[dict[int, int]],
+                 flt: tuple[str, List[int]] = ("", [])) -> List[int]:
+    # 1日ごとに主キー範囲の COUNT(*)。式の評価も group by の一時テーブルも無い。
+    return [_probe_one(db, lo, hi, flt) for lo, hi in zip(bounds, bounds[1:])]
+
+
+def _count_rollup(db, bounds: List[int], known: Optional[dict[int, int]],
+                  flt: tuple[str, List[int]] = ("", [])) -> List[int]:
+    # 締まった日は手元の集計（known: 日の添字 -> 件数）を使い、足りない日だけ probe する。
+    known = known or {}
+    counts = []
+    for i, (lo, hi) in enumerate(zip(bounds, bounds[1:])):
+        if i in known:
+            counts.append(int(known[i]))
+        else:
+            counts.append(_probe_one(db, lo, hi, flt))
+    return counts
+
+
+STRATEGIES = {
+    "grouped": _count_grouped,
+    "probe": _count_probe,
+    "rollup": _count_rollup,
+}
+
+# auto 選択のしきい値
+PROBE_MAX_DAYS = 31           # probe はクエリ数 = 日数なので短い範囲だけ
+PROBE_MIN_ROWS_PER_DAY = 500  # 1日あたりの行数が多いほど group by の一時テーブルが重い
+
+_LAST_QUERY: dict[str, Any] = {}
+
+
+def choose_strategy(days: int, est_rows: Optional[int] = None,
+                    known: Optional[dict[int, int]] = None) -> str:
+    """範囲と（前回集計から見積もった）行数で戦略を選ぶ。"""
+    if known and len(known) >= days - 1:
+        return "rollup"
+    if est_rows is not None and days <= PROBE_MAX_DAYS and est_rows >= PROBE_MIN_ROWS_PER_DAY * days:
+        return "probe"
+    return "grouped"
+
+
+def last_query_info() -> dict[str, Any]:
+    """直前の compute_last_n_days_counts の戦略と所要時間（診断用）。"""
+    return dict(_LAST_QUERY)
+
+
+def compute_last_n_days_counts(db, days: int, today: Optional[date] = None, strategy: str = "auto",
+                               est_rows: Optional[int] = None,
+                               known: Optional[dict[int, int]] = None,
+                               dids: Optional[List[int]] = None,
+                               select_days: Optional[int] = None) -> List[int]:
+    """
+    直近N日（今日含む）のrevlog行数をローカル日付ごとに集計する。
+
+    strategy は "auto" / "grouped" / "probe" / "rollup"。どれを選んでも結果は同じ。
+    est_rows は範囲内の行数の見積もり（前回の合計など）、known は既に分かっている日
+    （添字 -> 件数）で、どちらも auto 選択と rollup に使う。
+    dids を渡すとそのデッキ（子デッキ込みで渡す）のカードの復習だけ数える。
+    select_days は auto 選択に使う日数（表示範囲より前も少し数える時に、表示範囲で選ばせる）。
+    est_rows は days 全体の見積もりのまま渡してよい（1日あたりに直して比べる）。
+    """
+    days = int(days)
+    if days < 1:
+        days = 1
+
+    if today is None:
+        today = datetime.now().date()
+    bounds = day_bounds(days, today)
+
+    if strategy in STRATEGIES:
+        name = strategy
+    else:
+        sel = max(1, min(days, int(select_days or days)))
+        sel_rows = None if est_rows is None else est_rows * sel // days
+        name = choose_strategy(sel, sel_rows, known)
+
+    t0 = time.perf_counter()
+    counts = STRATEGIES[name](db, bounds, known, deck_filter(dids))
+    _LAST_QUERY.clear()
+    _LAST_QUERY.update({
+        "strategy": name,
+        "requested": strategy,
+        "days": days,
+        "est_rows": est_rows,
+        "ms": round((time.perf_counter() - t0) * 1000.0, 3),
+    })
+    return counts
+
+
+# -------------------- due forecast --------------------
+
+def compute_due_forecast(db, sched_today: int, days: int) -> List[int]:
+    """
+    明日から days 日分の復習予定枚数（queue 2/3 の cards.due）を1クエリで数える。
+
+    sched_today は col.sched.today（コレクション作成日からの日数）。
+    """
+    days = max(0, int(days))
+    if days == 0:
+        return []
+    today = int(sched_today)
+
+    rows = db.all(
+        """
+        SELECT (due - ?) AS d, COUNT(*) AS cnt
+        FROM cards
+        WHERE queue IN (2, 3) AND due BETWEEN ? AND ?
+        GROUP BY d
+        """,
+        today, today + 1, today + days,
+    )
+
+    counts = [0] * days
+    for d, cnt in rows:
+        try:
+            idx = int(d) - 1
+        except Exception:
+            continue
+        if 0 <= idx < days:
+            counts[idx] = int(cnt or 0)
+    return counts
+
+
+# -------------------- full history (streaming) --------------------
+
+def iter_daily_aggregates(db, chunk_days: int = 90, progress=None) -> Iterator[dict[str, Any]]:
+    """
+    revlog 全期間の日別集計を1日1行ずつ yield する。
+
+    日はチャートと同じくローカル0時で区切る（day_bounds）。
+    chunk_days 日ずつ id（主キー）の範囲で問い合わせるので、
+    メモリに載るのは常に1チャンク分だけ。
+    progress(done, total) を渡すと日単位で進捗を通知する。
+    """
+    row = db.all("SELECT MIN(id), MAX(id) FROM revlog")
+    if not row or row[0][0] is None:
+        return
+    first_day = datetime.fromtimestamp(int(row[0][0]) / 1000.0).date()
+    last_day = datetime.fromtimestamp(int(row[0][1]) / 1000.0).date()
+    total = (last_day - first_day).days + 1
+    step = max(1, int(chunk_days))
+
+    done = 0
+    while done < total:
+        n = min(step, total - done)
+        bounds = day_bounds(n, first_day + timedelta(days=done + n - 1))
+        start_ms = bounds[0]
+        width = _bucket_width(bounds)
+        rows = db.all(
+            """
+            SELECT ((id - ?) / ?) AS bucket, type, COUNT(*), COALESCE(SUM(time), 0)
+            FROM revlog
+            WHERE id >= ? AND id < ?
+            GROUP BY bucket, type
+            """,
+            start_ms, width, start_ms, bounds[-1],
+        )
+
+        days: dict[int, dict[str, Any]] = {}
+        for bucket, rtype, cnt, tms in rows:
+            idx = bisect_right(bounds, start_ms + int(bucket) * width) - 1
+            if not 0 <= idx < n:
+                continue
+            out = days.get(idx)
+            if out is None:
+                out = days[idx] = {k: 0 for k in EXPORT_FIELDS}
+                out["date"] = (first_day + timedelta(days=done + idx)).isoformat()
+            name = REVLOG_TYPES.get(int(rtype) if rtype is not None else -1)
+            out["count"] += int(cnt)
+            out["time_ms"] += int(tms)
+            if name:
+                out[name] += int(cnt)
+        for idx in sorted(days):
+            yield days[idx]
+
+        done += n
+        if progress is not None:
+            progress(done, total)
+
+
+# -------------------- static SVG --------------------
+
+# SVG 用の色（config.json が無い時はアドオンの既定値と同じ色）
+SVG_STYLE_DEFAULTS = {
+    "goal_per_day": 200,
+    "show_goal_line": True,
+    "tick_rgba": "rgba(120,160,235,0.28)",
+    "bar_rgba": "rgba(120,160,235,0.55)",
+    "today_bar_rgba": "rgba(235,120,120,0.80)",
+    "goal_line_rgba": "rgba(120,160,235,0.75)",
+    "goal_met_bar_rgba": "rgba(90,135,230,0.75)",
+    "today_goal_bar_rgba": "rgba(220,90,90,0.90)",
+}
+
+
+def render_svg(counts: List[int], title: str = "", style: Optional[dict[str, Any]] = None,
+               width: int = 720, height: int = 160) -> str:
+    """counts を JS なしの静的 SVG 棒グラフにする（レポート用）。"""
+    st = dict(SVG_STYLE_DEFAULTS)
+    if style:
+        st.update({k: v for k, v in style.items() if k in SVG_STYLE_DEFAULTS})
+
+    n = max(1, len(counts))
+    goal = int(st.get("goal_per_day") or 0)
+    show_goal = bool(st.get("show_goal_line", True)) and goal > 0
+    scale_max = max(1, max(counts) if counts else 0, goal if show_goal else 0)
+
+    head_h = 24
+    chart_h = height - head_h
+    slot = width / float(n)
+    gap = min(4.0, slot * 0.2)
+    bar_w = max(1.0, slot - gap)
+
+    parts = [
+        f"<svg xmlns='http://www.w3.org/2000/svg' width='{width}' height='{height}' "
+        f"viewBox='0 0 {width} {height}' font-family='sans-serif'>",
+        f"<text x='0' y='15' font-size='13' font-weight='600'>{_xml_escape(title)}</text>",
+        f"<line x1='0' y1='{height - 0.5}' x2='{width}' y2='{height - 0.5}' stroke='{st['tick_rgba']}' stroke-dasharray='3 3'/>",
+    ]
+    for i, v in enumerate(counts):
+        met = goal > 0 and v >= goal
+        if i == n - 1:
+            fill = st["today_goal_bar_rgba"] if met else st["today_bar_rgba"]
+        else:
+            fill = st["goal_met_bar_rgba"] if met else st["bar_rgba"]
+        h = max(1.0, chart_h * (v / scale_max))
+        parts.append(
+            f"<rect x='{i * slot + gap / 2:.1f}' y='{height - h:.1f}' width='{bar_w:.1f}' "
+            f"height='{h:.1f}' rx='2' fill='{fill}'><title>{v}</title></rect>"
+        )
+    if show_goal:
+        y = height - chart_h * (goal / scale_max)
+        parts.append(
+            f"<line x1='0' y1='{y:.1f}' x2='{width}' y2='{y:.1f}' stroke='{st['goal_line_rgba']}' stroke-width='2'/>"
+        )
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def _xml_escape(s: str) -> str:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("'", "&apos;")
+
+
+# -------------------- batch (many collections) --------------------
+
+def aggregate_collection(path: str, days: int, today_iso: Optional[str] = None,
+                         strategy: str = "auto") -> dict[str, Any]:
+    """1つの collection.anki2 を読み取り専用で開いて集計する（プロセスプールの単位）。"""
+    today = date.fromisoformat(today_iso) if today_iso else datetime.now().date()
+    out: dict[str, Any] = {"path": path, "range_days": int(days), "today": today.isoformat()}
+    db = None
+    try:
+        db = SqliteDB(path)
+        counts = compute_last_n_days_counts(db, days, today, strategy)
+        out["counts"] = counts
+        out["total"] = sum(counts)
+        out["query"] = last_query_info()
+    except Exception as e:
+        out["error"] = f"{e.__class__.__name__}: {e}"
+    finally:
+        if db is not None:
+            db.close()
+    return out
+
+
+def aggregate_many(paths: List[str], days: int, today_iso: Optional[str] = None,
+                   workers: Optional[int] = None, strategy: str = "auto") -> List[dict[str, Any]]:
+    """複数コレクションをプロセスプールで並列に集計する。結果は paths と同じ順。"""
+    if not paths:
+        return []
+    if workers == 1 or len(paths) == 1:
+        return [aggregate_collection(p, days, today_iso, strategy) for p in paths]
+    n = len(paths)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(aggregate_collection, paths, [days] * n, [today_iso] * n, [strategy] * n))
+
+
+def _chart_name(path: str, used: set[str]) -> str:
+    # .../<profile>/collection.anki2 -> <profile>
+    base = os.path.basename(os.path.dirname(os.path.abspath(path))) or "collection"
+    name = base
+    i = 2
+    while name in used:
+        name = f"{base}-{i}"
+        i += 1
+    used.add(name)
+    return name
+
+
+def _load_style(config_path: Optional[str]) -> dict[str, Any]:
+    if not config_path:
+        here = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+        config_path = here if os.path.exists(here) else None
+    if not config_path:
+        return {}
+    with open(config_path, "r", encoding="utf-8") as f:
+        c = json.load(f)
+    return c if isinstance(c, dict) else {}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Aggregate daily review counts from Anki collection files (read-only).")
+    ap.add_argument("paths", nargs="+", help="collection.anki2 files")
+    ap.add_argument("--days", type=int, default=30, help="range in days including today (default: 30)")
+    ap.add_argument("--today", default=None, help="treat this date (YYYY-MM-DD) as today")
+    ap.add_argument("--strategy", default="auto", choices=["auto"] + list(STRATEGIES),
+                    help="aggregation query strategy (default: auto)")
+    ap.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    ap.add_argument("--out", default="-", help="JSON output file (default: stdout)")
+    ap.add_argument("--svg-dir", default=None, help="also write one static SVG chart per collection here")
+    ap.add_argument("--config", default=None, help="config.json to take goal/colors from")
+    args = ap.parse_args(argv)
+
+    results = aggregate_many(args.paths, args.days, args.today, args.workers, args.strategy)
+
+    if args.svg_dir:
+        style = _load_style(args.config)
+        os.makedirs(args.svg_dir, exist_ok=True)
+        used: set[str] = set()
+        for r in results:
+            if "counts" not in r:
+                continue
+            name = _chart_name(r["path"], used)
+            svg_path = os.path.join(args.svg_dir, name + ".svg")
+            with open(svg_path, "w", encoding="utf-8") as f:
+                f.write(render_svg(r["counts"], f"{name} — last {r['range_days']} days: {r['total']} reviews", style))
+            r["svg"] = svg_path
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "range_days": args.days,
+        "collections": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out == "-":
+        sys.stdout.write(text + "\n")
+    else:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+"""
+pytest プラグイン（pytest.ini の -p で読む）。
+
+リポジトリ直下はアドオン本体（__init__.py が aqt を読む）なので、パッケージとしてではなく
+ただのディレクトリとして集める。これで pytest が __init__.py を import しない。
+"""
+
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def pytest_collect_directory(path, parent):
+    if Path(path).resolve() == ROOT:
+        return pytest.Dir.from_parent(parent, path=Path(path))
+    return None
@@ -0,0 +1,111 @@
+"""
+aggregate.py のテスト（aqt 不要）。
+
+一時ファイルの sqlite に revlog だけ作り、DST の切り替わりをまたいで
+どの戦略でも同じ件数になること、エクスポートの日付がチャートの日と一致することを見る。
+"""
+
+import os
+import sys
+import time
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aggregate  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not hasattr(time, "tzset"), reason="needs time.tzset")
+
+# 2026-03-08 02:00 に夏時間開始、2026-11-01 02:00 に終了
+DST_DAYS = [date(2026, 3, 8), date(2026, 11, 1)]
+
+# 各日のこの時刻（ローカル）に1件ずつ。日境界のすぐ前後と、切り替わり前後の時刻を含める
+LOCAL_TIMES = [(0, 0, 0), (0, 30, 0), (1, 30, 0), (3, 30, 0), (12, 0, 0), (23, 59, 59)]
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _make_revlog(path, days):
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE revlog (id INTEGER PRIMARY KEY, cid INTEGER, usn INTEGER, ease INTEGER,"
+        " ivl INTEGER, lastIvl INTEGER, factor INTEGER, time INTEGER, type INTEGER)"
+    )
+    ids = []
+    for n, d in enumerate(days):
+        for k, (hh, mm, ss) in enumerate(LOCAL_TIMES):
+            ms = int(datetime(d.year, d.month, d.day, hh, mm, ss).timestamp() * 1000) + n
+            ids.append(ms)
+            con.execute("INSERT INTO revlog VALUES (?, 1, 0, 3, 1, 1, 2500, 1000, ?)", (ms, k % 5))
+    con.commit()
+    con.close()
+    return ids
+
+
+def _expected(ids, today, days):
+    start = today - timedelta(days=days - 1)
+    counts = [0] * days
+    for ms in ids:
+        i = (datetime.fromtimestamp(ms / 1000.0).date() - start).days
+        if 0 <= i < days:
+            counts[i] += 1
+    return counts
+
+
+@pytest.mark.parametrize("dst_day", DST_DAYS)
+def test_strategies_agree_across_dst(tmp_path, new_york, dst_day):
+    days = 14
+    today = dst_day + timedelta(days=6)
+    span = [today - timedelta(days=i) for i in range(days + 3)]
+    ids = _make_revlog(str(tmp_path / "c.anki2"), span)
+    db = aggregate.SqliteDB(str(tmp_path / "c.anki2"))
+    try:
+        expected = _expected(ids, today, days)
+        results = {
+            name: aggregate.compute_last_n_days_counts(db, days, today, name)
+            for name in ("auto", "grouped", "probe", "rollup")
+        }
+        # rollup は締まった日を known から取り、今日だけ数える
+        known = {i: v for i, v in enumerate(expected[:-1])}
+        results["rollup+known"] = aggregate.compute_last_n_days_counts(db, days, today, "rollup", known=known)
+        # 表示範囲（7日）で選ばせると、行数が多ければ probe になる
+        results["auto+select"] = aggregate.compute_last_n_days_counts(
+            db, days, today, "auto", est_rows=10 ** 7, select_days=7
+        )
+        assert aggregate.last_query_info()["strategy"] == "probe"
+    finally:
+        db.close()
+
+    for name, counts in results.items():
+        assert counts == expected, name
+    assert sum(expected) == days * len(LOCAL_TIMES)
+
+
+@pytest.mark.parametrize("dst_day", DST_DAYS)
+def test_export_rows_match_chart_days(tmp_path, new_york, dst_day):
+    today = dst_day + timedelta(days=3)
+    span = [today - timedelta(days=i) for i in range(8)]
+    ids = _make_revlog(str(tmp_path / "c.anki2"), span)
+    db = aggregate.SqliteDB(str(tmp_path / "c.anki2"))
+    try:
+        rows = list(aggregate.iter_daily_aggregates(db, chunk_days=3))
+        chart = aggregate.compute_last_n_days_counts(db, len(span), today, "grouped")
+    finally:
+        db.close()
+
+    start = today - timedelta(days=len(span) - 1)
+    assert [r["date"] for r in rows] == [(start + timedelta(days=i)).isoformat() for i in range(len(span))]
+    assert [r["count"] for r in rows] == chart == _expected(ids, today, len(span))
+    for r in rows:
+        assert r["time_ms"] == 1000 * r["count"]
+        assert sum(r[k] for k in aggregate.REVLOG_TYPES.values()) == r["count"]